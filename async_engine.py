@@ -0,0 +1,294 @@
+'''
+An asyncio variant of the engine, for running many matches concurrently in one process.
+
+AsyncPlayer talks to its pokerbot over non-blocking streams and captures the pokerbot's output
+with a task instead of a thread, so a match costs no threads and no blocking reads. AsyncGame
+plays rounds through the same Game.round_queries generator as the blocking engine.
+'''
+import argparse
+import asyncio
+import socket
+import weakref
+import time
+import os
+
+from engine import Game, Player, RoundState, CheckAction, FoldAction, RESPONSE_NAME
+from game_config import GameConfig, add_config_arguments, config_from_args
+
+# the build lock of each pokerbot directory, per event loop since asyncio locks belong to one loop
+BUILD_LOCKS = weakref.WeakKeyDictionary()
+
+
+def build_lock(path):
+    '''
+    Returns the lock held while the pokerbot directory at path is being built.
+    '''
+    locks = BUILD_LOCKS.setdefault(asyncio.get_running_loop(), {})
+    return locks.setdefault(os.path.abspath(path), asyncio.Lock())
+
+
+class AsyncPlayer(Player):
+    '''
+    Handles subprocess and stream interactions with one player's pokerbot without blocking.
+    '''
+
+    def __init__(self, name, path, log_dir='.', config=None):
+        super().__init__(name, path, log_dir, config=config)
+        self.reader = None
+        self.writer = None
+        self.output_task = None
+
+    async def build(self):
+        '''
+        Loads the commands file and builds the pokerbot, unless the build cache shows it is up to date.
+        '''
+        self.load_commands()
+        if self.commands is not None and len(self.commands['build']) > 0:
+            # matches sharing a pokerbot directory build it one at a time, as in the blocking engine
+            async with build_lock(self.path):
+                if self.build_cache is not None:
+                    cached_output = self.build_cache.lookup(self.path, self.commands['build'])
+                    if cached_output is not None:
+                        print(self.name, 'build up to date')
+                        self.output.put(cached_output)
+                        return
+                before = self.build_cache.snapshot(self.path) if self.build_cache is not None else None
+                try:
+                    proc = await asyncio.create_subprocess_exec(*self.commands['build'],
+                                                                stdout=asyncio.subprocess.PIPE,
+                                                                stderr=asyncio.subprocess.STDOUT,
+                                                                cwd=self.path)
+                    try:
+                        outs, _ = await asyncio.wait_for(proc.communicate(), self.config.BUILD_TIMEOUT)
+                        self.output.put(outs)
+                        if proc.returncode == 0 and self.build_cache is not None:
+                            self.build_cache.store(self.path, self.commands['build'], outs, before)
+                    except asyncio.TimeoutError:
+                        proc.kill()
+                        outs, _ = await proc.communicate()
+                        error_message = 'Timed out waiting for ' + self.name + ' to build'
+                        print(error_message)
+                        self.output.put(outs)
+                        self.output.put(error_message.encode())
+                except (TypeError, ValueError):
+                    print(self.name, 'build command misformatted')
+                except OSError:
+                    print(self.name, 'build failed - check "build" in commands.json')
+
+    async def capture_output(self, stream):
+        '''
+        Copies the pokerbot's output into its OutputCapture until the pokerbot exits.
+        '''
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            self.output.put(data)
+
+    async def run(self):
+        '''
+        Runs the pokerbot and establishes the stream connection.
+        '''
+        if self.commands is not None and len(self.commands['run']) > 0:
+            connected = asyncio.get_running_loop().create_future()
+
+            def accept(reader, writer):
+                if connected.done():
+                    writer.close()
+                else:
+                    connected.set_result((reader, writer))
+            try:
+                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server_socket.bind(('', 0))
+                server = await asyncio.start_server(accept, sock=server_socket)
+                async with server:
+                    port = server_socket.getsockname()[1]
+                    proc = await asyncio.create_subprocess_exec(*self.commands['run'], str(port),
+                                                                stdout=asyncio.subprocess.PIPE,
+                                                                stderr=asyncio.subprocess.STDOUT,
+                                                                cwd=self.path)
+                    self.bot_subprocess = proc
+                    self.output_task = asyncio.ensure_future(self.capture_output(proc.stdout))
+                    # wait until we time out or the player connects
+                    self.reader, self.writer = await asyncio.wait_for(connected, self.config.CONNECT_TIMEOUT)
+                    # every message is a small write followed by a read, so never delay sends
+                    self.writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    print(self.name, 'connected successfully')
+            except (TypeError, ValueError):
+                print(self.name, 'run command misformatted')
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to connect')
+            except OSError:
+                print(self.name, 'run failed - check "run" in commands.json')
+
+    async def stop(self):
+        '''
+        Closes the stream connection and stops the pokerbot.
+        '''
+        if self.writer is not None:
+            try:
+                self.writer.write(b'Q\n')
+                self.writer.close()
+                await asyncio.wait_for(self.writer.wait_closed(), self.config.CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to disconnect')
+            except OSError:
+                print('Could not close socket connection with', self.name)
+        if self.bot_subprocess is not None:
+            try:
+                await asyncio.wait_for(self.bot_subprocess.wait(), self.config.CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to quit')
+                self.bot_subprocess.kill()
+                await self.bot_subprocess.wait()
+        if self.output_task is not None:
+            await self.output_task
+        self.output.close()
+
+    async def save_bot_state(self):
+        '''
+        Asks the pokerbot for its state at a checkpoint, like Player.save_bot_state.
+        '''
+        if self.writer is None or self.game_clock <= 0.:
+            return ''
+        try:
+            self.writer.write(b'X\n')
+            await self.writer.drain()
+            reply = (await asyncio.wait_for(self.reader.readline(), self.config.CONNECT_TIMEOUT)).decode().strip()
+        except (asyncio.TimeoutError, OSError):
+            print('Could not save the state of', self.name)
+            return ''
+        return reply[1:] if reply.startswith('X') else ''
+
+    async def query(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the pokerbot over the stream connection.
+
+        Behaves exactly like Player.query, but yields to other matches while waiting.
+        '''
+        legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        if self.writer is not None and self.game_clock > 0.:
+            clause = ''
+            try:
+                player_message[0] = 'T{:.3f}'.format(self.game_clock)
+                message = ' '.join(player_message) + '\n'
+                del player_message[1:]  # do not send redundant action history
+                start_time = time.perf_counter()
+                self.writer.write(message.encode())
+                await self.writer.drain()
+                clause = (await asyncio.wait_for(self.reader.readline(), self.config.CONNECT_TIMEOUT)).decode().strip()
+                end_time = time.perf_counter()
+                self.latency.record(round_state, RESPONSE_NAME(clause), end_time - start_time)
+                if self.config.ENFORCE_GAME_CLOCK:
+                    self.game_clock -= end_time - start_time
+                if self.game_clock <= 0.:
+                    raise asyncio.TimeoutError
+                action = self.decode_action(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
+            except asyncio.TimeoutError:
+                error_message = self.name + ' ran out of time'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+            except OSError:
+                error_message = self.name + ' disconnected'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+            except ValueError:
+                game_log.append(self.name + ' response misformatted: ' + str(clause))
+        return CheckAction() if CheckAction in legal_actions else FoldAction()
+
+
+class AsyncGame(Game):
+    '''
+    Runs one game of poker between AsyncPlayers as a coroutine.
+    '''
+
+    def __init__(self, players=None, output_dir='.', config=None, **kwargs):
+        config = GameConfig() if config is None else config
+        if players is None:
+            players = [
+                AsyncPlayer(config.PLAYER_1_NAME, config.PLAYER_1_PATH, output_dir, config),
+                AsyncPlayer(config.PLAYER_2_NAME, config.PLAYER_2_PATH, output_dir, config)
+            ]
+        super().__init__(players, output_dir, config=config, **kwargs)
+
+    async def run_round(self, players, bounties, deck, round_num):
+        '''
+        Runs one round of poker with the given shuffled deck.
+        '''
+        queries = self.round_queries(players, bounties, deck, round_num)
+        action = None
+        while True:
+            try:
+                active, round_state = queries.send(action)
+            except StopIteration:
+                return
+            action = await players[active].query(round_state, self.player_messages[active], self.log)
+
+    async def run_phase(self, phase, players, method):
+        '''
+        Awaits the named method of every player concurrently and records how long the phase took.
+        '''
+        times = {}
+
+        async def timed(player):
+            start_time = time.perf_counter()
+            await getattr(player, method)()
+            times[player.name] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        await asyncio.gather(*(timed(player) for player in players))
+        self.phase_times[phase] = {'wall': time.perf_counter() - start_time, 'players': times}
+
+    async def checkpoint(self, round_num):
+        '''
+        Saves the game after the round, with the state of each pokerbot.
+        '''
+        bot_states = await asyncio.gather(*(player.save_bot_state() for player in self.players))
+        self.write_checkpoint(round_num, {player.name: state for player, state in zip(self.players, bot_states)})
+
+    async def run(self):
+        '''
+        Runs one game of poker and returns the final bankroll of each player by name.
+        '''
+        await self.run_phase('build', self.players, 'build')
+        await self.run_phase('connect', self.players, 'run')
+        start_time = time.perf_counter()
+        for round_num in self.rounds:
+            players, bounties, deck = self.start_round(round_num)
+            await self.run_round(players, bounties, deck, round_num)
+            if self.end_round(players, round_num):
+                break
+            if self.checkpoint_due(round_num):
+                await self.checkpoint(round_num)
+        self.phase_times['play'] = {'wall': time.perf_counter() - start_time, 'players': {}}
+        await self.run_phase('shutdown', self.seating(self.rounds[-1] + 1), 'stop')
+        self.report_phases()
+        return self.finish()
+
+
+async def run_games(games, max_concurrent=None):
+    '''
+    Runs AsyncGames concurrently, at most max_concurrent at a time, and returns their results.
+    '''
+    semaphore = asyncio.Semaphore(max_concurrent or len(games) or 1)
+
+    async def run_game(game):
+        async with semaphore:
+            return await game.run()
+    return await asyncio.gather(*(run_game(game) for game in games))
+
+
+def parse_args():
+    '''
+    Parses the engine's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 async_engine.py')
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    print(asyncio.run(AsyncGame(config=config_from_args(parse_args())).run()))
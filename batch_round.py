@@ -0,0 +1,228 @@
+'''
+Many independent rounds of poker stepped at once with NumPy, for evaluating strategies over
+millions of hands and for training.
+
+A RoundBatch holds N rounds as arrays with one row per round, using the card, bounty and action
+encodings of round_core. Every method is the array form of the RoundCore method of the same name
+and follows the same rules, so each row plays exactly as a RoundCore would. Rows whose round is
+over ignore further actions until they are restarted with new cards. Showdowns are scored with
+equity.py's vectorized seven card evaluator.
+'''
+import numpy as np
+
+from equity import add_cards, score_hands
+from round_core import CALL, CHECK, DEFAULT_RULES, FOLD, RAISE, RoundCore
+
+
+def deal_cards(size, rng=None):
+    '''
+    Returns `size` random deals of 9 distinct card indices each, as rows of a (size, 9) array.
+    '''
+    rng = np.random.default_rng(rng)
+    cards = rng.integers(0, 52, (size, 9))
+    # redraw the deals which repeat a card until none do
+    repeated = np.arange(size)
+    while len(repeated):
+        cards[repeated] = rng.integers(0, 52, (len(repeated), 9))
+        ordered = np.sort(cards[repeated], axis=1)
+        repeated = repeated[(ordered[:, 1:] == ordered[:, :-1]).any(axis=1)]
+    return cards
+
+
+def hand_scores(cards):
+    '''
+    Scores seven card hands given as rows of card indices, so that better hands score higher.
+    '''
+    counts = [np.zeros(len(cards), dtype=np.int64) for _ in range(4)]
+    suits = np.zeros(len(cards), dtype=np.int64)
+    for column in cards.T:
+        add_cards(counts, suits, column >> 2, column & 3)
+    return score_hands(counts, suits)
+
+
+class RoundBatch():
+    '''
+    N rounds of poker, advanced in place together.
+
+    cards has one row of 9 card indices per round, laid out as in RoundCore. Once a row's round is
+    over, done is set, delta holds player 0's delta and bounty_hits which players hit their bounty.
+    '''
+
+    def __init__(self, cards, bounties, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.size = len(cards)
+        self.rows = np.arange(self.size)
+        self.button = np.zeros(self.size, dtype=np.int64)
+        self.street = np.zeros(self.size, dtype=np.int64)
+        self.pips = np.zeros((self.size, 2), dtype=np.int64)
+        self.stacks = np.zeros((self.size, 2), dtype=np.int64)
+        self.cards = np.zeros((self.size, 9), dtype=np.int64)
+        self.bounties = np.zeros((self.size, 2), dtype=np.int64)
+        self.done = np.zeros(self.size, dtype=bool)
+        self.delta = np.zeros(self.size, dtype=np.int64)
+        self.bounty_hits = np.zeros((self.size, 2), dtype=bool)
+        self.restart(self.rows, cards, bounties)
+
+    @classmethod
+    def deal(cls, size, rules=DEFAULT_RULES, rng=None):
+        '''
+        Returns a batch of `size` new rounds with random cards and bounties.
+        '''
+        rng = np.random.default_rng(rng)
+        return cls(deal_cards(size, rng), rng.integers(0, 13, (size, 2)), rules)
+
+    @classmethod
+    def from_cores(cls, cores):
+        '''
+        Returns a batch holding the rounds of RoundCores with the same rules, in their current states.
+        '''
+        batch = cls([core.cards for core in cores], [core.bounties for core in cores], cores[0].rules)
+        batch.button[:] = [core.button for core in cores]
+        batch.street[:] = [core.street for core in cores]
+        batch.pips[:] = [core.pips for core in cores]
+        batch.stacks[:] = [core.stacks for core in cores]
+        for row, core in enumerate(cores):
+            if core.delta is not None:
+                batch.done[row] = True
+                batch.delta[row] = core.delta
+                batch.bounty_hits[row] = core.bounty_hits
+        return batch
+
+    def core(self, row):
+        '''
+        Returns one row's round as a RoundCore.
+        '''
+        core = RoundCore(self.cards[row].tolist(), self.bounties[row].tolist(), self.rules, int(self.button[row]),
+                         int(self.street[row]), self.pips[row].tolist(), self.stacks[row].tolist())
+        if self.done[row]:
+            core.delta = int(self.delta[row])
+            core.bounty_hits = tuple(self.bounty_hits[row].tolist())
+        return core
+
+    def restart(self, rows, cards, bounties):
+        '''
+        Starts new rounds in the given rows, such as those which are done, with the given cards
+        and bounties, one row of each per restarted row.
+        '''
+        rules = self.rules
+        self.button[rows] = 0
+        self.street[rows] = 0
+        self.pips[rows] = [rules.small_blind, rules.big_blind]
+        self.stacks[rows] = [rules.starting_stack - rules.small_blind, rules.starting_stack - rules.big_blind]
+        self.cards[rows] = cards
+        self.bounties[rows] = bounties
+        self.done[rows] = False
+        self.delta[rows] = 0
+        self.bounty_hits[rows] = False
+
+    def active(self):
+        '''
+        Returns the index of the player to act in each row.
+        '''
+        return self.button & 1
+
+    def legal_actions(self):
+        '''
+        Returns the mask of the active player's legal actions in each row, 0 in rows which are done.
+        '''
+        active = self.button & 1
+        continue_cost = self.pips[self.rows, 1 - active] - self.pips[self.rows, active]
+        # betting and raising are only allowed if both players can afford it
+        check_masks = np.where((self.stacks == 0).any(axis=1), CHECK | FOLD, CHECK | RAISE | FOLD)
+        raises_forbidden = (continue_cost == self.stacks[self.rows, active]) | (self.stacks[self.rows, 1 - active] == 0)
+        call_masks = np.where(raises_forbidden, FOLD | CALL, FOLD | CALL | RAISE)
+        return np.where(self.done, 0, np.where(continue_cost == 0, check_masks, call_masks))
+
+    def raise_bounds(self):
+        '''
+        Returns arrays of the minimum and maximum legal raises in each row.
+        '''
+        active = self.button & 1
+        pips = self.pips[self.rows, active]
+        continue_cost = self.pips[self.rows, 1 - active] - pips
+        max_contribution = np.minimum(self.stacks[self.rows, active], self.stacks[self.rows, 1 - active] + continue_cost)
+        min_contribution = np.minimum(max_contribution, continue_cost + np.maximum(continue_cost, self.rules.big_blind))
+        return pips + min_contribution, pips + max_contribution
+
+    def get_bounty_hits(self, rows):
+        '''
+        Returns whether each player's bounty rank is among their hole cards or the board dealt so
+        far, in the given rows.
+        '''
+        rank_bits = np.left_shift(1, self.cards[rows] >> 2)
+        dealt = np.arange(5) < self.street[rows, None]
+        board = np.bitwise_or.reduce(np.where(dealt, rank_bits[:, 4:], 0), axis=1)
+        ranks = np.stack([board | rank_bits[:, 0] | rank_bits[:, 1], board | rank_bits[:, 2] | rank_bits[:, 3]], axis=1)
+        return (ranks >> self.bounties[rows]) & 1 == 1
+
+    def finish(self, rows, winners):
+        '''
+        Ends the rounds in the given rows with the given winners, 2 for a split pot, applying the
+        bounty rules as round_core.bounty_delta does.
+        '''
+        rules = self.rules
+        hits = self.get_bounty_hits(rows)
+        stacks = self.stacks[rows]
+        won_0 = rules.starting_stack - stacks[:, 1]
+        won_1 = stacks[:, 0] - rules.starting_stack
+        split = (rules.starting_stack - stacks[:, 0]) * (rules.bounty_ratio - 1) / 2 + rules.bounty_constant
+        delta = np.select(
+            [winners == 0, winners == 1, hits[:, 0] & ~hits[:, 1], ~hits[:, 0] & hits[:, 1]],
+            [np.where(hits[:, 0], won_0 * rules.bounty_ratio + rules.bounty_constant, won_0),
+             np.where(hits[:, 1], won_1 * rules.bounty_ratio - rules.bounty_constant, won_1),
+             split, -split],
+            0.).astype(np.float64)
+        # a non-integer delta is rounded down or up depending on who is in position
+        fractional = np.abs(delta - np.floor(delta)) > 1e-6
+        delta = np.where(fractional, np.where(self.button[rows] & 1 == 0, np.floor(delta), np.ceil(delta)), delta)
+        self.delta[rows] = delta.astype(np.int64)
+        self.bounty_hits[rows] = hits
+        self.done[rows] = True
+
+    def showdown(self, rows):
+        '''
+        Compares the players' hands in the given rows and ends their rounds.
+        '''
+        cards = self.cards[rows]
+        score_0 = hand_scores(np.concatenate([cards[:, 0:2], cards[:, 4:9]], axis=1))
+        score_1 = hand_scores(np.concatenate([cards[:, 2:4], cards[:, 4:9]], axis=1))
+        self.finish(rows, np.where(score_0 > score_1, 0, np.where(score_0 < score_1, 1, 2)))
+
+    def proceed(self, actions, amounts=None):
+        '''
+        Performs one action of the active player in every row which is not done, given as arrays
+        of FOLD, CALL, CHECK or RAISE and of the amounts raised to. The actions must be legal.
+        Returns the mask of rows whose round is over.
+        '''
+        live = ~self.done
+        active = self.button & 1
+        folds = live & (actions == FOLD)
+        calls = live & (actions == CALL)
+        checks = live & (actions == CHECK)
+        raises = live & (actions == RAISE)
+        limps = calls & (self.button == 0)
+        calls &= ~limps
+        pips = self.pips[self.rows, active]
+        contribution = np.where(calls, self.pips[self.rows, 1 - active] - pips, 0)
+        if amounts is not None:
+            contribution += np.where(raises, amounts - pips, 0)
+        self.pips[self.rows, active] += contribution
+        self.stacks[self.rows, active] -= contribution
+        # sb calls bb
+        self.pips[limps] = self.rules.big_blind
+        self.stacks[limps] = self.rules.starting_stack - self.rules.big_blind
+        # a call after the blinds, or a check once both players acted, ends the street
+        both_acted = ((self.street == 0) & (self.button > 0)) | (self.button > 1)
+        street_over = calls | (checks & both_acted)
+        self.button += limps | calls | raises | (checks & ~both_acted)
+        showdowns = street_over & (self.street == 5)
+        advancing = street_over & ~showdowns
+        self.street[advancing] = np.where(self.street[advancing] == 0, 3, self.street[advancing] + 1)
+        self.button[advancing] = 1
+        self.pips[advancing] = 0
+        if folds.any():
+            # the active player folds, so the other one wins
+            self.finish(self.rows[folds], 1 - active[folds])
+        if showdowns.any():
+            self.showdown(self.rows[showdowns])
+        return self.done
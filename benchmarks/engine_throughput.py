@@ -0,0 +1,171 @@
+'''
+Measures the engine's throughput with trivial pokerbots, to catch changes which slow matches down.
+
+Plays a match between an always-check and an always-call pokerbot in every configuration: bot
+subprocesses over each transport, and bots run in-process. Both bots reach showdown every round
+and decide instantly, so the time measured is the engine's and the skeleton runner's own. Each
+configuration runs in a fresh worker process, whose peak memory is its own.
+
+Reports rounds and decisions per second, the engine's CPU time per round and its peak resident
+memory. The results can be saved as a JSON baseline and later runs compared against it.
+
+Run from the repository root: python3 benchmarks/engine_throughput.py [--rounds N] [--baseline FILE]
+'''
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import subprocess
+import argparse
+import resource
+import tempfile
+import shutil
+import json
+import time
+import sys
+import io
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine
+from game_config import GameConfig
+from null_bot import make_null_bot
+
+CONFIGURATIONS = ['tcp', 'unix', 'socketpair', 'pipe', 'in-process']
+# the engine's CPU time per round may rise, and its rounds per second fall, by this much before a regression
+TOLERANCE = 0.1
+
+
+def counting(player_class):
+    '''
+    Returns a subclass of player_class which counts the decisions it is asked for.
+    '''
+    class CountingPlayer(player_class):
+        def query(self, round_state, player_message, game_log):
+            if isinstance(round_state, engine.RoundState):
+                self.decisions = getattr(self, 'decisions', 0) + 1
+            return super().query(round_state, player_message, game_log)
+    return CountingPlayer
+
+
+def peak_memory_mb():
+    '''
+    Returns the peak resident memory of this process in megabytes.
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_configuration(configuration, bot_paths, num_rounds, output_dir, write_logs):
+    '''
+    Plays one match in the configuration and returns its measurements.
+    '''
+    config = GameConfig(NUM_ROUNDS=num_rounds, SEED=1, WRITE_GAME_LOG=write_logs, WRITE_HAND_HISTORY=write_logs,
+                        WRITE_LATENCY_STATS=False, BUILD_CACHE_DIR=None)
+    if configuration == 'in-process':
+        player_class = counting(engine.InProcessPlayer)
+        players = [player_class(name, path, output_dir, config=config) for name, path in zip('AB', bot_paths)]
+    else:
+        player_class = counting(engine.Player)
+        players = [player_class(name, path, output_dir, configuration, config=config) for name, path in zip('AB', bot_paths)]
+    game = engine.Game(players, output_dir, config=config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cpu_start = time.process_time()
+        game.run()
+        cpu_seconds = time.process_time() - cpu_start
+    play_seconds = game.phase_times['play']['wall']
+    decisions = sum(getattr(player, 'decisions', 0) for player in players)
+    return {
+        'rounds_per_sec': num_rounds / play_seconds,
+        'decisions_per_sec': decisions / play_seconds,
+        'cpu_us_per_round': 1e6 * cpu_seconds / num_rounds,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+
+def benchmark(configurations, num_rounds, repeat, write_logs):
+    '''
+    Runs every configuration `repeat` times, each in a fresh process, keeping the fastest run.
+    '''
+    work_dir = tempfile.mkdtemp(prefix='pokerbots-bench-')
+    results = {}
+    try:
+        bot_paths = [make_null_bot(os.path.join(work_dir, action), action) for action in ('check', 'call')]
+        for configuration in configurations:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    runs.append(executor.submit(run_configuration, configuration, bot_paths, num_rounds,
+                                                work_dir, write_logs).result())
+            results[configuration] = max(runs, key=lambda run: run['rounds_per_sec'])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def revision():
+    '''
+    Returns the git commit being measured, or None outside a git checkout.
+    '''
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    '''
+    Prints the measurements as a fixed-width table.
+    '''
+    print('{:<12}{:>12}{:>16}{:>18}{:>16}'.format('Mode', 'Rounds/sec', 'Decisions/sec', 'CPU/round (us)', 'Peak mem (MB)'))
+    for configuration, result in results.items():
+        print('{:<12}{rounds_per_sec:>12.1f}{decisions_per_sec:>16.1f}{cpu_us_per_round:>18.1f}'
+              '{peak_memory_mb:>16.1f}'.format(configuration, **result))
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    '''
+    Prints the change of each configuration from the baseline and returns whether any regressed.
+    '''
+    print('Compared with baseline', baseline.get('revision') or '')
+    regressed = False
+    for configuration, result in results.items():
+        if configuration not in baseline['results']:
+            continue
+        before = baseline['results'][configuration]
+        speed = result['rounds_per_sec'] / before['rounds_per_sec'] - 1
+        cpu = result['cpu_us_per_round'] / before['cpu_us_per_round'] - 1
+        slower = speed < -tolerance or cpu > tolerance
+        regressed = regressed or slower
+        print('{:<12}rounds/sec {:+.1%}, CPU/round {:+.1%}{}'.format(configuration, speed, cpu, '  REGRESSION' if slower else ''))
+    return regressed
+
+
+def parse_args():
+    '''
+    Parses the benchmark's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/engine_throughput.py')
+    parser.add_argument('--rounds', type=int, default=engine.DEFAULT_CONFIG.NUM_ROUNDS, help='Rounds per match')
+    parser.add_argument('--repeat', type=int, default=1, help='Matches per configuration, keeping the fastest')
+    parser.add_argument('--configurations', nargs='+', choices=CONFIGURATIONS, default=CONFIGURATIONS)
+    parser.add_argument('--no-logs', action='store_true', help='Skip writing the game log and hand history')
+    parser.add_argument('--save', type=str, default=None, metavar='FILE', help='Write the results as a JSON baseline')
+    parser.add_argument('--baseline', type=str, default=None, metavar='FILE',
+                        help='Compare with a saved baseline, exiting with status 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Relative slowdown counted as a regression')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = benchmark(args.configurations, args.rounds, args.repeat, not args.no_logs)
+    print_results(results)
+    if args.save is not None:
+        with open(args.save, 'w') as baseline_file:
+            json.dump({'revision': revision(), 'rounds': args.rounds, 'results': results}, baseline_file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as baseline_file:
+            if compare(results, json.load(baseline_file), args.tolerance):
+                sys.exit(1)
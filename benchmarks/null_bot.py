@@ -0,0 +1,39 @@
+'''
+Writes the trivial pokerbots the benchmarks play, which always check or always call and decide
+instantly, so that a benchmark measures the engine and the skeleton runner rather than a bot.
+'''
+import shutil
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NULL_BOT = """'''
+A pokerbot which always {0}s when it can.
+'''
+from skeleton.actions import CallAction, CheckAction
+from skeleton.bot import Bot
+from skeleton.runner import parse_args, run_bot
+
+
+class Player(Bot):
+    def get_action(self, game_state, round_state, active):
+        return {1}Action() if {1}Action in round_state.legal_actions() else {2}Action()
+
+
+if __name__ == '__main__':
+    run_bot(Player(), parse_args())
+"""
+
+
+def make_null_bot(directory, action='call'):
+    '''
+    Writes a pokerbot built on the Python skeleton which always checks or always calls into
+    directory, and returns directory.
+    '''
+    shutil.copytree(os.path.join(ROOT, 'python_skeleton', 'skeleton'), os.path.join(directory, 'skeleton'))
+    other = 'Call' if action == 'check' else 'Check'
+    with open(os.path.join(directory, 'player.py'), 'w') as bot_file:
+        bot_file.write(NULL_BOT.format(action, action.capitalize(), other))
+    with open(os.path.join(directory, 'commands.json'), 'w') as commands_file:
+        commands_file.write('{"build": [], "run": ["' + sys.executable + '", "player.py"]}')
+    return directory
@@ -0,0 +1,138 @@
+'''
+Measures the cost of one action on the engine's RoundState, on a RoundCore and in a RoundBatch.
+
+Plays the same rounds on both with a fixed policy: the first player to act on each street raises
+the minimum, and everyone else calls or checks, so every round has raises, calls and checks on
+every street and ends at showdown. Reports the time per action, including its legal action query
+and each round's showdown, and the speedup of the core. Simulations which branch also pay for a
+RoundCore.copy(), timed separately. A RoundBatch steps every round at once, so its cost per action
+is its total time divided among the actions of all the rounds.
+
+Run from the repository root: python3 benchmarks/round_state.py [--rounds N]
+'''
+import argparse
+import time
+import sys
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine
+from batch_round import RoundBatch
+from round_core import CALL, CHECK, RAISE
+
+
+def deals(num_rounds):
+    '''
+    Returns the initial RoundState of each round of a seeded match.
+    '''
+    config = engine.DEFAULT_CONFIG
+    schedule = engine.DealSchedule(1, num_rounds)
+    states = []
+    for round_num in range(1, num_rounds + 1):
+        deck, bounties = schedule.deal(round_num)
+        hands = [deck.deal(2), deck.deal(2)]
+        states.append(engine.RoundState(0, 0, [config.SMALL_BLIND, config.BIG_BLIND],
+                                        [config.STARTING_STACK - config.SMALL_BLIND, config.STARTING_STACK - config.BIG_BLIND],
+                                        hands, deck, bounties, None, config))
+    return states
+
+
+def play_round_states(states):
+    '''
+    Plays every round on RoundStates and returns the number of actions and the deltas.
+    '''
+    actions = 0
+    deltas = []
+    for round_state in states:
+        while isinstance(round_state, engine.RoundState):
+            legal_actions = round_state.legal_actions()
+            if round_state.button < 2 and engine.RaiseAction in legal_actions:
+                action = engine.RaiseAction(round_state.raise_bounds()[0])
+            elif engine.CallAction in legal_actions:
+                action = engine.CallAction()
+            else:
+                action = engine.CheckAction()
+            round_state = round_state.proceed(action)
+            actions += 1
+        deltas.append(round_state.deltas[0])
+    return actions, deltas
+
+
+def play_cores(cores):
+    '''
+    Plays every round on RoundCores and returns the number of actions and the deltas.
+    '''
+    actions = 0
+    deltas = []
+    for core in cores:
+        over = False
+        while not over:
+            legal_actions = core.legal_actions()
+            if core.button < 2 and legal_actions & RAISE:
+                over = core.proceed(RAISE, core.raise_bounds()[0])
+            else:
+                over = core.proceed(CALL if legal_actions & CALL else CHECK)
+            actions += 1
+        deltas.append(core.delta)
+    return actions, deltas
+
+
+def play_batch(batch):
+    '''
+    Plays every round of a RoundBatch at once and returns the number of actions and the deltas.
+    '''
+    actions = 0
+    while not batch.done.all():
+        legal_actions = batch.legal_actions()
+        raises = (batch.button < 2) & (legal_actions & RAISE != 0)
+        choices = np.where(raises, RAISE, np.where(legal_actions & CALL != 0, CALL, CHECK))
+        actions += int((~batch.done).sum())
+        batch.proceed(choices, batch.raise_bounds()[0])
+    return actions, batch.delta.tolist()
+
+
+def benchmark(num_rounds):
+    '''
+    Times both implementations over the same rounds, checking that they agree.
+    '''
+    states = deals(num_rounds)
+    cores = [round_state.core() for round_state in states]
+    start_time = time.perf_counter()
+    actions, state_deltas = play_round_states(states)
+    state_seconds = time.perf_counter() - start_time
+    batch = RoundBatch.from_cores(cores)
+    start_time = time.perf_counter()
+    batch_actions, batch_deltas = play_batch(batch)
+    batch_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    core_actions, core_deltas = play_cores(cores)
+    core_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for core in cores:
+        core.copy()
+    copy_seconds = time.perf_counter() - start_time
+    assert (actions, state_deltas) == (core_actions, core_deltas), 'RoundCore disagrees with RoundState'
+    assert (actions, state_deltas) == (batch_actions, batch_deltas), 'RoundBatch disagrees with RoundState'
+    print('{} rounds, {} actions'.format(num_rounds, actions))
+    print('{:<12}{:>16}'.format('', 'Per action (ns)'))
+    print('{:<12}{:>16.0f}'.format('RoundState', state_seconds / actions * 1e9))
+    print('{:<12}{:>16.0f}'.format('RoundCore', core_seconds / actions * 1e9))
+    print('{:<12}{:>16.0f}'.format('RoundBatch', batch_seconds / actions * 1e9))
+    print('Speedup {:.2f}x with RoundCore, {:.2f}x with RoundBatch, RoundCore.copy() {:.0f}ns'.format(
+        state_seconds / core_seconds, state_seconds / batch_seconds, copy_seconds / num_rounds * 1e9))
+
+
+def parse_args():
+    '''
+    Parses the benchmark's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/round_state.py')
+    parser.add_argument('--rounds', type=int, default=20000, help='Rounds to play on each implementation')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    benchmark(parse_args().rounds)
@@ -0,0 +1,78 @@
+'''
+Measures the per-decision round-trip latency of each engine-bot transport.
+
+Plays a match between two always-check/call pokerbots over every transport and reports the
+wall-clock time of Player.query, which is what the engine charges to each bot's game clock.
+
+Run from the repository root: python3 benchmarks/transport_latency.py [--rounds N]
+'''
+import contextlib
+import argparse
+import tempfile
+import shutil
+import time
+import sys
+import io
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import engine
+from null_bot import make_null_bot
+
+TRANSPORTS = ['tcp', 'unix', 'socketpair', 'pipe']
+
+
+class TimedPlayer(engine.Player):
+    '''
+    Player which records the wall-clock time of every query.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def query(self, round_state, player_message, game_log):
+        start_time = time.perf_counter()
+        action = super().query(round_state, player_message, game_log)
+        self.latencies.append(time.perf_counter() - start_time)
+        return action
+
+
+def benchmark(transport, bot_path, num_rounds, output_dir):
+    '''
+    Plays one match over the transport and summarizes the query latencies in microseconds.
+    '''
+    players = [TimedPlayer('A', bot_path, output_dir, transport), TimedPlayer('B', bot_path, output_dir, transport)]
+    game = engine.Game(players, output_dir, rounds=range(1, num_rounds + 1), write_log=False, write_history=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        game.run()
+        elapsed = time.perf_counter() - start_time
+    latencies = sorted(players[0].latencies + players[1].latencies)
+    return {
+        'transport': transport,
+        'queries': len(latencies),
+        'mean_us': 1e6 * sum(latencies) / len(latencies),
+        'p50_us': 1e6 * latencies[len(latencies) // 2],
+        'p99_us': 1e6 * latencies[int(len(latencies) * 0.99)],
+        'rounds_per_sec': num_rounds / elapsed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 benchmarks/transport_latency.py')
+    parser.add_argument('--rounds', type=int, default=engine.DEFAULT_CONFIG.NUM_ROUNDS, help='Rounds per match')
+    parser.add_argument('--transports', nargs='+', choices=TRANSPORTS, default=TRANSPORTS)
+    args = parser.parse_args()
+    work_dir = tempfile.mkdtemp(prefix='pokerbots-bench-')
+    try:
+        bot_path = make_null_bot(os.path.join(work_dir, 'null_bot'))
+        print('{:<12}{:>10}{:>12}{:>12}{:>12}{:>14}'.format('Transport', 'Queries', 'Mean (us)', 'p50 (us)',
+                                                            'p99 (us)', 'Rounds/sec'))
+        for transport in args.transports:
+            result = benchmark(transport, bot_path, args.rounds, work_dir)
+            print('{transport:<12}{queries:>10}{mean_us:>12.1f}{p50_us:>12.1f}{p99_us:>12.1f}'
+                  '{rounds_per_sec:>14.1f}'.format(**result))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
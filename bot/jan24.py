@@ -4,7 +4,6 @@ Simple example pokerbot, written in Python.
 
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
 from skeleton.states import GameState, TerminalState, RoundState
-from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
 
@@ -391,9 +390,9 @@ class Player(Bot):
         )  # the number of chips needed to stay in the pot
         my_bounty = round_state.bounties[active]  # your current bounty rank
         # the number of chips you have contributed to the pot
-        my_contribution = STARTING_STACK - my_stack
+        my_contribution = game_state.parameters.starting_stack - my_stack
         # the number of chips your opponent has contributed to the pot
-        opp_contribution = STARTING_STACK - opp_stack
+        opp_contribution = game_state.parameters.starting_stack - opp_stack
         pot_total = my_contribution + opp_contribution
         # the smallest and largest numbers of chips for a legal bet/raise
         min_raise, max_raise = round_state.raise_bounds()
@@ -420,7 +419,7 @@ class Player(Bot):
         # STRATEGYSTRATEGYSTRATEGYSTRATEGYSTRATEGYSTRATEGY
         # On the preflop round, check fold some percentage of the time on "weak" hands
 
-        if game_state.bankroll > ((NUM_ROUNDS - game_state.round_num) * 2 * BIG_BLIND):
+        if game_state.bankroll > ((game_state.parameters.num_rounds - game_state.round_num) * 2 * game_state.parameters.big_blind):
             return FoldAction()
 
         if street < 3 and hole_strength == "green":
@@ -616,9 +615,9 @@ class Player(Bot):
         )  # the number of chips needed to stay in the pot
         my_bounty = round_state.bounties[active]  # your current bounty rank
         # the number of chips you have contributed to the pot
-        my_contribution = STARTING_STACK - my_stack
+        my_contribution = game_state.parameters.starting_stack - my_stack
         # the number of chips your opponent has contributed to the pot
-        opp_contribution = STARTING_STACK - opp_stack
+        opp_contribution = game_state.parameters.starting_stack - opp_stack
         pot_total = my_contribution + opp_contribution
 
         win_rate = self.calculate_win_rate(my_cards, board_cards)
@@ -2,10 +2,14 @@
 The infrastructure for interacting with the engine.
 '''
 import argparse
+import base64
+import pickle
 import socket
+import sys
+import io
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction
 from .states import GameState, TerminalState, RoundState
-from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
+from .states import GameParameters, DEFAULT_PARAMETERS
 from .bot import Bot
 
 
@@ -14,19 +18,24 @@ class Runner():
     Interacts with the engine.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, parameters=DEFAULT_PARAMETERS):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.parameters = parameters
+        self.game_state = GameState(0, 0., 1, parameters)
+        self.round_state = None
+        self.active = 0
+        self.round_flag = True
 
     def receive(self):
         '''
         Generator for incoming messages from the engine.
         '''
         while True:
-            packet = self.socketfile.readline().strip().split(' ')
-            if not packet:
+            line = self.socketfile.readline()
+            if not line:
                 break
-            yield packet
+            yield line.strip().split(' ')
 
     def send(self, action):
         '''
@@ -43,79 +52,140 @@ class Runner():
         self.socketfile.write(code + '\n')
         self.socketfile.flush()
 
+    def handle_packet(self, packet):
+        '''
+        Applies one message from the engine to the game tree and returns the pokerbot's response.
+
+        Returns None once the engine signals the end of the game. An engine which keeps the pokerbot
+        running between matches sends N instead, which starts a new match from a fresh game state.
+        The first message of a match carries the game parameters in an S clause, and the first
+        message after resuming from a checkpoint carries the saved game and pokerbot state in a Z clause.
+        '''
+        for clause in packet:
+            if clause[0] == 'T':
+                self.game_state = GameState(self.game_state.bankroll, float(clause[1:]), self.game_state.round_num,
+                                            self.parameters)
+            elif clause[0] == 'S':
+                values = [float(value) for value in clause[1:].split(',')[:len(GameParameters._fields)]]
+                self.parameters = GameParameters(*(int(value) if value.is_integer() else value for value in values))
+                self.game_state = GameState(self.game_state.bankroll, self.game_state.game_clock, self.game_state.round_num,
+                                            self.parameters)
+            elif clause[0] == 'Z':
+                round_num, bankroll, state = clause[1:].split(',')
+                self.game_state = GameState(int(bankroll), self.game_state.game_clock, int(round_num), self.parameters)
+                if state:
+                    self.pokerbot.restore_state(pickle.loads(base64.b64decode(state)))
+            elif clause[0] == 'P':
+                self.active = int(float(clause[1:]))
+            elif clause[0] == 'H':
+                hands = [[], []]
+
+                hands[self.active] = clause[1:].split(',')
+                small_blind, big_blind = self.parameters.small_blind, self.parameters.big_blind
+                pips = [small_blind, big_blind]
+                stacks = [self.parameters.starting_stack - small_blind, self.parameters.starting_stack - big_blind]
+                self.round_state = RoundState(0, 0, pips, stacks, hands, None, [], None, self.parameters)
+            elif clause[0] == 'G':
+                round_state = self.round_state
+                bounties = ['-1', '-1']
+                bounties[self.active] = clause[1:]
+                self.round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                              round_state.hands, bounties, round_state.deck, round_state.previous_state,
+                                              self.parameters)
+                if self.round_flag:
+                    self.pokerbot.handle_new_round(self.game_state, self.round_state, self.active)
+                    self.round_flag = False
+            elif clause[0] == 'F':
+                self.round_state = self.round_state.proceed(FoldAction())
+            elif clause[0] == 'C':
+                self.round_state = self.round_state.proceed(CallAction())
+            elif clause[0] == 'K':
+                self.round_state = self.round_state.proceed(CheckAction())
+            elif clause[0] == 'R':
+                self.round_state = self.round_state.proceed(RaiseAction(int(float(clause[1:]))))
+            elif clause[0] == 'B':
+                round_state = self.round_state
+                self.round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                              round_state.hands, round_state.bounties, clause[1:].split(','), round_state.previous_state,
+                                              self.parameters)
+            elif clause[0] == 'O':
+                # backtrack
+                round_state = self.round_state.previous_state
+                revised_hands = list(round_state.hands)
+                revised_hands[1-self.active] = clause[1:].split(',')
+                # rebuild history
+                round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
+                                         revised_hands, round_state.bounties, round_state.deck, round_state.previous_state,
+                                         self.parameters)
+                self.round_state = TerminalState([0, 0], None, round_state)
+            elif clause[0] == 'D':
+                assert isinstance(self.round_state, TerminalState)
+                delta = int(float(clause[1:]))
+                deltas = [-delta, -delta]
+                deltas[self.active] = delta
+                self.round_state = TerminalState(deltas, None, self.round_state.previous_state)
+                self.game_state = GameState(self.game_state.bankroll + delta, self.game_state.game_clock, self.game_state.round_num,
+                                            self.parameters)
+            elif clause[0] == 'Y':
+                assert isinstance(self.round_state, TerminalState)
+                hero_hit_bounty, opponent_hit_bounty = (clause[1] == '1'), (clause[2] == '1')
+                if self.active == 1:
+                    hero_hit_bounty, opponent_hit_bounty = opponent_hit_bounty, hero_hit_bounty
+                self.round_state = TerminalState(self.round_state.deltas, [hero_hit_bounty, opponent_hit_bounty],
+                                                 self.round_state.previous_state)
+                self.pokerbot.handle_round_over(self.game_state, self.round_state, self.active)
+                self.game_state = GameState(self.game_state.bankroll, self.game_state.game_clock, self.game_state.round_num + 1,
+                                            self.parameters)
+                self.round_flag = True
+            elif clause[0] == 'N':
+                self.new_match()
+            elif clause[0] == 'Q':
+                return None
+        if self.round_flag:  # ack the engine
+            return CheckAction()
+        assert self.active == self.round_state.button % 2
+        return self.pokerbot.get_action(self.game_state, self.round_state, self.active)
+
+    def new_match(self):
+        '''
+        Starts a new match from a fresh game state and returns N, the reply which confirms it to
+        an engine keeping the pokerbot running between matches. A skeleton which ignores the N
+        clause answers K instead, and is restarted.
+        '''
+        self.parameters = DEFAULT_PARAMETERS
+        self.game_state = GameState(0, 0., 1, self.parameters)
+        self.round_state = None
+        self.active = 0
+        self.round_flag = True
+        self.pokerbot.handle_new_match()
+        return 'N'
+
+    def save_state(self):
+        '''
+        Encodes the pokerbot's saved state as the reply to the engine's checkpoint message X.
+        '''
+        state = self.pokerbot.save_state()
+        if state is None:
+            return 'X'
+        return 'X' + base64.b64encode(pickle.dumps(state)).decode()
+
     def run(self):
         '''
         Reconstructs the game tree based on the action history received from the engine.
         '''
-        game_state = GameState(0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
         for packet in self.receive():
-            for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(float(clause[1:]))
-                elif clause[0] == 'H':
-                    hands = [[], []]
-
-                    hands[active] = clause[1:].split(',')
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, pips, stacks, hands, None, [], None)
-                elif clause[0] == 'G':
-                    bounties = ['-1', '-1']
-                    bounties[active] = clause[1:]
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, bounties, round_state.deck, round_state.previous_state)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(float(clause[1:]))))
-                elif clause[0] == 'B':
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, round_state.bounties, clause[1:].split(','), round_state.previous_state)
-                elif clause[0] == 'O':
-                    # backtrack
-                    round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             revised_hands, round_state.bounties, round_state.deck, round_state.previous_state)
-                    round_state = TerminalState([0, 0], None, round_state)
-                elif clause[0] == 'D':
-                    assert isinstance(round_state, TerminalState)
-                    delta = int(float(clause[1:]))
-                    deltas = [-delta, -delta]
-                    deltas[active] = delta
-                    round_state = TerminalState(deltas, None, round_state.previous_state)
-                    game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
-                elif clause[0] == 'Y':
-                    assert isinstance(round_state, TerminalState)
-                    hero_hit_bounty, opponent_hit_bounty = (clause[1] == '1'), (clause[2] == '1')
-                    if active == 1:
-                        hero_hit_bounty, opponent_hit_bounty = opponent_hit_bounty, hero_hit_bounty
-                    round_state = TerminalState(round_state.deltas, [hero_hit_bounty, opponent_hit_bounty], round_state.previous_state)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
-                    round_flag = True
-                elif clause[0] == 'Q':
-                    return
-            if round_flag:  # ack the engine
-                self.send(CheckAction())
-            else:
-                assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
-                self.send(action)
+            if packet == ['X']:
+                self.socketfile.write(self.save_state() + '\n')
+                self.socketfile.flush()
+                continue
+            if packet == ['N']:
+                self.socketfile.write(self.new_match() + '\n')
+                self.socketfile.flush()
+                continue
+            action = self.handle_packet(packet)
+            if action is None:
+                return
+            self.send(action)
 
 
 def parse_args():
@@ -124,16 +194,38 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
-    return parser.parse_args()
+    parser.add_argument('--unix', type=str, default=None, help='Unix domain socket to connect to instead of a port')
+    parser.add_argument('--fd', type=int, default=None, help='Connected socket inherited from the engine')
+    parser.add_argument('--pipe', action='store_true', help='Talk to the engine over stdin and stdout')
+    parser.add_argument('port', type=int, nargs='?', default=None, help='Port on host to connect to')
+    args = parser.parse_args()
+    if args.port is None and args.unix is None and args.fd is None and not args.pipe:
+        parser.error('a port, --unix, --fd or --pipe is required')
+    return args
 
 def run_bot(pokerbot, args):
     '''
     Runs the pokerbot.
     '''
     assert isinstance(pokerbot, Bot)
+    if getattr(args, 'pipe', False):
+        # the engine owns stdin and stdout, so anything the pokerbot prints goes to stderr
+        engine_in = io.FileIO(sys.stdin.fileno(), 'r', closefd=False)
+        engine_out = io.FileIO(sys.stdout.fileno(), 'w', closefd=False)
+        socketfile = io.TextIOWrapper(io.BufferedRWPair(engine_in, engine_out))
+        sys.stdout = sys.stderr
+        Runner(pokerbot, socketfile).run()
+        return
     try:
-        sock = socket.create_connection((args.host, args.port))
+        if getattr(args, 'fd', None) is not None:
+            sock = socket.socket(fileno=args.fd)
+        elif getattr(args, 'unix', None) is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(args.unix)
+        else:
+            sock = socket.create_connection((args.host, args.port))
+            # every message is a small write followed by a read, so never delay sends
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     except OSError:
         print('Could not connect to {}:{}'.format(args.host, args.port))
         return
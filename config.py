@@ -7,13 +7,44 @@ PLAYER_2_NAME = "B"
 PLAYER_2_PATH = "./python_skeleton"  # Change this to './player_chatbot' to interact with your own bot!
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = "gamelog"
+# SET TO False TO SKIP FORMATTING AND WRITING THE GAME LOG, E.G. FOR LONG TRAINING RUNS
+WRITE_GAME_LOG = True
+# SET TO False TO SKIP THE STRUCTURED HAND HISTORY (GAME_LOG_FILENAME + '.jsonl')
+WRITE_HAND_HISTORY = True
+# SET TO False TO SKIP THE PER-BOT RESPONSE TIME REPORT (GAME_LOG_FILENAME + '_latency.json')
+WRITE_LATENCY_STATS = True
 # PLAYER_LOG_SIZE_LIMIT IS IN BYTES
 PLAYER_LOG_SIZE_LIMIT = 524288
+# THE FIRST AND LAST HALF OF THE LIMIT ARE KEPT, STREAMING WRITES THE FIRST HALF TO DISK AS THE BOT RUNS
+STREAM_PLAYER_LOGS = False
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
 ENFORCE_GAME_CLOCK = True
 STARTING_GAME_CLOCK = 60.0
 BUILD_TIMEOUT = 10.0
 CONNECT_TIMEOUT = 10.0
+# DIRECTORY RECORDING SUCCESSFUL BUILDS, WHICH ARE SKIPPED WHILE THE BOT DIRECTORY IS UNCHANGED, None ALWAYS BUILDS
+BUILD_CACHE_DIR = ".build_cache"
+# HOW THE ENGINE TALKS TO BOT SUBPROCESSES: "tcp", "unix", "socketpair" OR "pipe"
+TRANSPORT = "tcp"
+# RUN PYTHON BOTS INSIDE THE ENGINE PROCESS INSTEAD OF AS SUBPROCESSES OVER SOCKETS
+IN_PROCESS_BOTS = False
+# PLAY EVERY DEAL TWICE WITH THE SEATS SWAPPED SO THAT CARD LUCK CANCELS OUT BETWEEN THE BOTS
+DUPLICATE_DEALS = False
+# MASTER SEED OF THE DEAL SCHEDULE, None DRAWS A FRESH SEED WHICH IS WRITTEN TO THE GAME LOG
+SEED = None
+# ONCE A PLAYER IS ALL-IN AND NO BETS ARE LEFT, CHECK FOR BOTH BOTS AND RUN THE BOARD OUT WITHOUT QUERYING THEM
+AUTO_ADVANCE_ALL_IN = False
+# ALSO SCORE ROUNDS WHERE BOTH BOTS ARE ALL-IN BEFORE THE RIVER BY THEIR EXACT EQUITY, AS AN ALL-IN ADJUSTED BANKROLL
+# LOGGED BESIDE THE REAL ONE. WHEN OFF, THE GAME LOG IS UNCHANGED AND THE ADJUSTED BANKROLL IS THE REAL ONE
+ALL_IN_EQUITY = False
+# END A MATCH EARLY ONCE A SEQUENTIAL TEST IS CONFIDENT ONE BOT IS BETTER, OR THAT THEY ARE WITHIN THE TOLERANCE
+EARLY_STOPPING = False
+# THE TEST'S APPROXIMATE ERROR RATE, ITS TOLERANCE IN CHIPS PER ROUND AND THE FEWEST ROUNDS PLAYED BEFORE STOPPING
+EARLY_STOPPING_ALPHA = 0.05
+EARLY_STOPPING_TOLERANCE = 5.0
+EARLY_STOPPING_MIN_ROUNDS = 50
+# SAVE THE MATCH AND EACH BOT'S STATE EVERY THIS MANY ROUNDS, SO AN INTERRUPTED MATCH CAN RESUME, None NEVER SAVES
+CHECKPOINT_ROUNDS = None
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_ROUNDS = 1000
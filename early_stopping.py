@@ -0,0 +1,73 @@
+'''
+Sequential test for ending a head-to-head match as soon as its result is clear.
+
+The test watches the running per-round deltas of the first player and keeps a confidence
+sequence for their mean, using the normal mixture boundary. With a known variance, that interval
+holds the true mean with the chosen confidence at every round at once, so it could be checked
+after every round without inflating the error rate. Here the variance is estimated from the same
+deltas the interval is built from, so the error rate is only approximately the chosen one, and
+can exceed it in short matches or when a few large pots dominate the deltas. The minimum number
+of rounds before stopping keeps the estimate from resting on a handful of rounds.
+
+The match can stop when the interval excludes zero, so one bot is better, or when it lies within
+plus or minus the tolerance, so the bots are equivalent for practical purposes.
+'''
+import math
+
+# the number of observations around which the boundary is tightest
+MIXTURE_OBSERVATIONS = 100
+
+
+class SequentialTest():
+    '''
+    Decides between "A is better", "B is better" and "equivalent" from a stream of deltas of A.
+    '''
+
+    def __init__(self, alpha=0.05, tolerance=5., min_observations=30):
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.min_observations = min_observations
+        self.count = 0
+        self.mean = 0.
+        self.sum_squares = 0.
+
+    def update(self, delta):
+        '''
+        Adds one observation, with Welford's update of the running mean and variance.
+        '''
+        self.count += 1
+        difference = delta - self.mean
+        self.mean += difference / self.count
+        self.sum_squares += difference * (delta - self.mean)
+
+    def radius(self):
+        '''
+        Returns the half-width of the confidence sequence around the running mean.
+        '''
+        variance = max(self.sum_squares / (self.count - 1), 1e-9)
+        scale = self.count * variance + MIXTURE_OBSERVATIONS * variance
+        boundary = math.sqrt(2 * scale * math.log(math.sqrt(scale / (MIXTURE_OBSERVATIONS * variance)) * 2 / self.alpha))
+        return boundary / self.count
+
+    def decision(self):
+        '''
+        Returns "A" or "B" once that player is better, "equivalent" once neither is better by more
+        than the tolerance per observation, or None while the test is undecided.
+        '''
+        if self.count < max(self.min_observations, 2):
+            return None
+        radius = self.radius()
+        if self.mean - radius > 0:
+            return 'A'
+        if self.mean + radius < 0:
+            return 'B'
+        if -self.tolerance < self.mean - radius and self.mean + radius < self.tolerance:
+            return 'equivalent'
+        return None
+
+    def summary(self):
+        '''
+        Describes the running mean and its confidence interval.
+        '''
+        return '{:.2f} +/- {:.2f} per round at {:.0%} confidence after {} observations'.format(
+            self.mean, self.radius(), 1 - self.alpha, self.count)
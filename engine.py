@@ -2,13 +2,21 @@
 6.9630 MIT POKERBOTS GAME ENGINE
 DO NOT REMOVE, RENAME, OR EDIT THIS FILE
 '''
-from collections import namedtuple
-from threading import Thread
-from queue import Queue
+from collections import namedtuple, deque
+from threading import Thread, Lock
+from array import array
+import contextlib
+import argparse
+import hashlib
+import importlib.util
+import traceback
 import time
 import math
 import json
 import subprocess
+import selectors
+import tempfile
+import shutil
 import socket
 import eval7
 import sys
@@ -16,7 +24,12 @@ import os
 import random
 
 sys.path.append(os.getcwd())
-from config import *
+from game_config import GameConfig, add_config_arguments, config_from_args
+from hand_history import HandHistoryWriter
+from equity import runout_outcomes
+from early_stopping import SequentialTest
+from profiler import EngineProfiler
+from round_core import RoundCore, Rules, action_sets, bounty_delta, encode_card, encode_rank, legal_mask, raise_bounds
 
 FoldAction = namedtuple('FoldAction', [])
 CallAction = namedtuple('CallAction', [])
@@ -27,10 +40,20 @@ TerminalState = namedtuple('TerminalState', ['deltas', 'bounty_hits', 'previous_
 
 STREET_NAMES = ['Flop', 'Turn', 'River']
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction}
+ACTION_TYPES = {action.__name__: action for action in DECODE.values()}
+RESPONSE_NAME = lambda clause: DECODE[clause[0]].__name__ if clause[:1] in DECODE else 'Misformatted'
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
 STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
+RANK_NAMES = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+DECK_CARDS = eval7.Deck().cards
+LEGAL_ACTIONS = action_sets(FoldAction, CallAction, CheckAction, RaiseAction)
+# the configuration of RoundStates created without one
+DEFAULT_CONFIG = GameConfig()
+# one lock per pokerbot directory, so that players in one process never build a directory concurrently
+BUILD_LOCKS = {}
+BUILD_LOCKS_LOCK = Lock()
 
 # Socket encoding scheme:
 #
@@ -46,6 +69,10 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # D### the player's bankroll delta from the round
 # Y## (both numbers 0 or 1 (or # which means masked): first is player hit bounty, second is opponent hit bounty)
 #       Note: only winning player bounty hit is revealed (or both if split pot)
+# S#,#,#,#,#,#,# the game parameters, sent in the first message of every match: NUM_ROUNDS,
+#       STARTING_STACK, BIG_BLIND, SMALL_BLIND, ROUNDS_PER_BOUNTY, BOUNTY_RATIO, BOUNTY_CONSTANT
+# Z#,#,* the round number, bankroll and base64-encoded pokerbot state to resume a match from a checkpoint
+# X (sent alone) save the pokerbot's state for a checkpoint, answered by X and the base64-encoded state
 # Q game over
 #
 # Clauses are separated by spaces
@@ -55,9 +82,10 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # Action history is sent once, including the player's actions
 
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'bounties', 'previous_state'])):
+class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'deck', 'bounties', 'previous_state', 'config'],
+                            defaults=[DEFAULT_CONFIG])):
     '''
-    Encodes the game tree for one round of poker.
+    Encodes the game tree for one round of poker, under the stacks, blinds and bounty rules of its config.
     '''
     def get_bounty_hits(self):
         '''
@@ -78,47 +106,24 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         return (self.bounties[0] in [cardNames[card.rank] for card in cards0],
                 self.bounties[1] in [cardNames[card.rank] for card in cards1])
 
-    def get_delta(self, winner_index: int) -> int:
+    def get_delta(self, winner_index: int, bounty_hits=None) -> int:
         '''Returns the delta after bounty rules are applied.
 
         Args:
             winner_index (int): Index of the winning player. Must be 0 (player A),
                 1 (player B), or 2 (split pot).
+            bounty_hits (tuple[bool, bool], optional): Whether each player hit their
+                bounty, instead of checking the cards dealt so far.
 
         Returns:
             int: The delta value after applying bounty rules.
         '''
         assert winner_index in [0, 1, 2]
 
-        bounty_hit_0, bounty_hit_1 = self.get_bounty_hits()
-
-        delta = 0
-        if winner_index == 2:
-            # Case of split pots
-            assert(self.stacks[0] == self.stacks[1]) # split pots only happen on the river + equal stacks
-            delta = STARTING_STACK - self.stacks[0]
-            if bounty_hit_0 and not bounty_hit_1:
-                delta = delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT
-            elif not bounty_hit_0 and bounty_hit_1:
-                delta = -(delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT)
-            else:
-                delta = 0
-        else:
-            # Case of one player winning
-            if winner_index == 0:
-                delta = STARTING_STACK - self.stacks[1]
-                if bounty_hit_0:
-                    delta = delta * BOUNTY_RATIO + BOUNTY_CONSTANT
-            else:
-                delta = self.stacks[0] - STARTING_STACK
-                if bounty_hit_1:
-                    delta = delta * BOUNTY_RATIO - BOUNTY_CONSTANT
-
-        # if delta is not an integer, round it down or up depending on who's in position
-        if abs(delta - math.floor(delta)) > 1e-6:
-            delta = math.floor(delta) if self.button % 2 == 0 else math.ceil(delta)
-        return int(delta)
-
+        config = self.config
+        bounty_hits = self.get_bounty_hits() if bounty_hits is None else bounty_hits
+        return bounty_delta(winner_index, self.stacks, bounty_hits, self.button,
+                            config.STARTING_STACK, config.BOUNTY_RATIO, config.BOUNTY_CONSTANT)
 
     def showdown(self) -> TerminalState:
         '''
@@ -153,30 +158,41 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         
         return TerminalState([int(delta), -int(delta)], self.get_bounty_hits(), self)
 
+    def expected_delta(self, street):
+        '''
+        Returns player 0's delta averaged over every runout of the board after its first `street`
+        cards, for a round which is checked down from this state to showdown.
+
+        Each runout's delta follows the same bounty rules as showdown.
+        '''
+        board = self.deck.peek(street) if street > 0 else []
+        outcomes = runout_outcomes(self.hands, board, self.bounties)
+        # the state showdown is called from once the river is checked through
+        river_state = RoundState(2, 5, [0, 0], self.stacks, self.hands, self.deck, self.bounties, self, self.config)
+        total = sum(count * river_state.get_delta(winner, bounty_hits) for (winner, bounty_hits), count in outcomes.items())
+        return total / sum(outcomes.values())
+
     def legal_actions(self):
         '''
-        Returns a set which corresponds to the active player's legal moves.
+        Returns a frozenset which corresponds to the active player's legal moves.
         '''
-        active = self.button % 2
-        continue_cost = self.pips[1-active] - self.pips[active]
-        if continue_cost == 0:
-            # we can only raise the stakes if both players can afford it
-            bets_forbidden = (self.stacks[0] == 0 or self.stacks[1] == 0)
-            return {CheckAction, FoldAction} if bets_forbidden else {CheckAction, RaiseAction, FoldAction}
-        # continue_cost > 0
-        # similarly, re-raising is only allowed if both players can afford it
-        raises_forbidden = (continue_cost == self.stacks[active] or self.stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+        return LEGAL_ACTIONS[legal_mask(self.button, self.pips, self.stacks)]
 
     def raise_bounds(self):
         '''
         Returns a tuple of the minimum and maximum legal raises.
         '''
-        active = self.button % 2
-        continue_cost = self.pips[1-active] - self.pips[active]
-        max_contribution = min(self.stacks[active], self.stacks[1-active] + continue_cost)
-        min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
-        return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        return raise_bounds(self.button, self.pips, self.stacks, self.config.BIG_BLIND)
+
+    def core(self):
+        '''
+        Returns the round as a RoundCore, for fast simulation of its continuations.
+        '''
+        config = self.config
+        rules = Rules(config.STARTING_STACK, config.SMALL_BLIND, config.BIG_BLIND, config.BOUNTY_RATIO, config.BOUNTY_CONSTANT)
+        cards = [encode_card(card) for card in self.hands[0] + self.hands[1] + self.deck.cards[:5]]
+        bounties = [encode_rank(rank) for rank in self.bounties]
+        return RoundCore(cards, bounties, rules, self.button, self.street, self.pips, self.stacks)
 
     def proceed_street(self):
         '''
@@ -185,7 +201,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         if self.street == 5:
             return self.showdown()
         new_street = 3 if self.street == 0 else self.street + 1
-        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.deck, self.bounties, self)
+        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.deck, self.bounties, self, self.config)
 
     def proceed(self, action):
         '''
@@ -216,47 +232,372 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
             return TerminalState([delta, -delta], self.get_bounty_hits(), self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self.bounties, self)
+                big_blind = self.config.BIG_BLIND
+                return RoundState(1, 0, [big_blind] * 2, [self.config.STARTING_STACK - big_blind] * 2,
+                                  self.hands, self.deck, self.bounties, self, self.config)
             # both players acted
             new_pips = list(self.pips)
             new_stacks = list(self.stacks)
             contribution = new_pips[1-active] - new_pips[active]
             new_stacks[active] -= contribution
             new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self)
+            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self, self.config)
             return state.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.bounties, self)
+            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.deck, self.bounties, self, self.config)
         # isinstance(action, RaiseAction)
         new_pips = list(self.pips)
         new_stacks = list(self.stacks)
         contribution = action.amount - new_pips[active]
         new_stacks[active] -= contribution
         new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self)
+        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.deck, self.bounties, self, self.config)
+
+
+class OutputCapture():
+    '''
+    Captures a pokerbot's output as it runs, within a bounded amount of memory.
+
+    The first head_size bytes are kept, or written straight to the log file when streaming,
+    followed by a ring buffer of the last tail_size bytes. Everything in between is dropped and
+    only counted, and a marker with the count separates the head from the tail in the log file.
+    '''
+
+    def __init__(self, head_size, tail_size, filename, stream=False):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.filename = filename
+        self.stream = stream
+        self.head = []
+        self.head_length = 0
+        self.tail = deque()
+        self.tail_length = 0
+        self.dropped = 0
+        self.log_file = None
+        self.closed = False
+        self.lock = Lock()
+
+    def put(self, data):
+        '''
+        Captures one chunk of output; empty and missing output, and output after closing, is ignored.
+        '''
+        if not data:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            room = self.head_size - self.head_length
+            if room > 0:
+                chunk = data[:room]
+                data = data[room:]
+                self.head_length += len(chunk)
+                if self.stream:
+                    if self.log_file is None:
+                        self.log_file = open(self.filename, 'wb')
+                    self.log_file.write(chunk)
+                else:
+                    self.head.append(chunk)
+            if data:
+                self.tail.append(data)
+                self.tail_length += len(data)
+                # drop whole chunks while the rest still fills the tail
+                while self.tail_length - len(self.tail[0]) >= self.tail_size:
+                    chunk = self.tail.popleft()
+                    self.tail_length -= len(chunk)
+                    self.dropped += len(chunk)
+
+    def close(self):
+        '''
+        Writes whatever is still in memory to the log file and closes it. Closing again does nothing.
+        '''
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            tail = b''.join(self.tail)
+            if len(tail) > self.tail_size:
+                self.dropped += len(tail) - self.tail_size
+                tail = tail[len(tail) - self.tail_size:]
+            if self.log_file is None:
+                self.log_file = open(self.filename, 'wb')
+            for chunk in self.head:
+                self.log_file.write(chunk)
+            if self.dropped:
+                self.log_file.write('\n[{} bytes of output dropped]\n'.format(self.dropped).encode())
+            self.log_file.write(tail)
+            self.log_file.close()
+            self.log_file = None
+            self.head = []
+            self.tail.clear()
+            self.tail_length = 0
+
+
+class LatencyStats():
+    '''
+    Records how long a pokerbot takes to respond to each query, by street and response type.
+
+    Queries at the end of a round are recorded under the street "RoundOver".
+    '''
+    STREETS = {0: 'Preflop', 3: 'Flop', 4: 'Turn', 5: 'River'}
+    PERCENTILES = [50, 90, 99]
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, round_state, response_name, seconds):
+        '''
+        Records one response time.
+        '''
+        street = self.STREETS[round_state.street] if isinstance(round_state, RoundState) else 'RoundOver'
+        key = (street, response_name)
+        if key not in self.samples:
+            self.samples[key] = array('d')
+        self.samples[key].append(seconds)
+
+    @staticmethod
+    def summarize(samples):
+        '''
+        Returns the count, total, percentiles, maximum and a power-of-two histogram of the samples.
+
+        Histogram buckets are keyed by their upper bound in microseconds.
+        '''
+        samples = sorted(samples)
+        histogram = {}
+        for seconds in samples:
+            bound = 2 ** max(0, math.ceil(math.log2(max(seconds, 1e-9) * 1e6)))
+            histogram[bound] = histogram.get(bound, 0) + 1
+        summary = {'count': len(samples), 'total': sum(samples)}
+        for percentile in LatencyStats.PERCENTILES:
+            summary['p' + str(percentile)] = samples[min(len(samples) - 1, len(samples) * percentile // 100)]
+        summary['max'] = samples[-1]
+        summary['histogram_us'] = {str(bound): count for bound, count in sorted(histogram.items())}
+        return summary
+
+    def report(self):
+        '''
+        Returns summaries over all queries, by street, by response type and by both, in seconds.
+        '''
+        everything = []
+        groups = {'by_street': {}, 'by_response': {}, 'by_street_response': {}}
+        for (street, response_name), samples in self.samples.items():
+            everything.extend(samples)
+            groups['by_street'].setdefault(street, []).extend(samples)
+            groups['by_response'].setdefault(response_name, []).extend(samples)
+            groups['by_street_response'][street + '/' + response_name] = samples
+        report = {'all': self.summarize(everything) if everything else {'count': 0}}
+        for name, group in groups.items():
+            report[name] = {key: self.summarize(samples) for key, samples in group.items()}
+        return report
+
+
+class PipeFile():
+    '''
+    Line-based file over the pipes to a pokerbot's stdin and from its stdout, with a read timeout.
+    '''
+
+    def __init__(self, read_fd, write_fd, timeout):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.buffer = b''
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(read_fd, selectors.EVENT_READ)
+        self.timeout = timeout
+
+    def write(self, text):
+        data = text.encode()
+        while data:
+            data = data[os.write(self.write_fd, data):]
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        while b'\n' not in self.buffer:
+            if not self.selector.select(self.timeout):
+                raise socket.timeout
+            data = os.read(self.read_fd, 65536)
+            if not data:
+                break
+            self.buffer += data
+        line, newline, self.buffer = self.buffer.partition(b'\n')
+        return (line + newline).decode()
+
+    def close(self):
+        self.selector.close()
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class BuildCache():
+    '''
+    Remembers successful builds, so that a pokerbot is only rebuilt when its sources have changed.
+
+    An entry holds a hash of the build command and of the pokerbot's build inputs, its source files
+    and build scripts, along with the build's output. Files the pokerbot writes while it plays,
+    such as logs, are not inputs, so they never force a rebuild. The entry also lists the files the
+    build created or changed, which must all still exist. While they do and the inputs still hash
+    the same, the build is skipped and its output replayed.
+    '''
+    # the files which count as build inputs, by extension and by name
+    SOURCE_EXTENSIONS = ('.py', '.c', '.cc', '.cpp', '.cxx', '.h', '.hh', '.hpp', '.java', '.jar',
+                         '.rs', '.go', '.sh', '.cmake', '.json', '.toml')
+    BUILD_FILES = ('CMakeLists.txt', 'Makefile', 'makefile', 'requirements.txt')
+    # directories holding build outputs or caches, which are never inputs
+    SKIPPED_DIRECTORIES = ('build', '__pycache__', 'target', 'node_modules')
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def entry_filename(self, path):
+        '''
+        Returns the file holding the cache entry of the pokerbot in path.
+        '''
+        key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, key + '.json')
+
+    @classmethod
+    def digest(cls, path, command):
+        '''
+        Hashes the build command and the names and contents of the build inputs under path.
+        '''
+        digest = hashlib.sha256(json.dumps(command).encode())
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(name for name in dirs if name not in cls.SKIPPED_DIRECTORIES and not name.startswith('.'))
+            for filename in sorted(files):
+                if not filename.endswith(cls.SOURCE_EXTENSIONS) and filename not in cls.BUILD_FILES:
+                    continue
+                filename = os.path.join(root, filename)
+                digest.update(os.path.relpath(filename, path).encode() + b'\0')
+                try:
+                    with open(filename, 'rb') as source_file:
+                        for chunk in iter(lambda: source_file.read(1 << 20), b''):
+                            digest.update(chunk)
+                except OSError:
+                    digest.update(b'\0unreadable')
+        return digest.hexdigest()
+
+    def lookup(self, path, command):
+        '''
+        Returns the output of the cached build if the pokerbot in path is unchanged since, or None.
+        '''
+        try:
+            with open(self.entry_filename(path), 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if any(not os.path.exists(os.path.join(path, name)) for name in entry.get('outputs', [])):
+            return None
+        if entry.get('digest') != self.digest(path, command):
+            return None
+        return entry['output'].encode()
+
+    @staticmethod
+    def snapshot(path):
+        '''
+        Returns the modification time of every file under path, by name relative to path.
+        '''
+        times = {}
+        for root, dirs, files in os.walk(path):
+            for filename in files:
+                filename = os.path.join(root, filename)
+                try:
+                    times[os.path.relpath(filename, path)] = os.stat(filename).st_mtime_ns
+                except OSError:
+                    pass
+        return times
+
+    def store(self, path, command, output, before):
+        '''
+        Records a successful build of the pokerbot in path, given the snapshot() taken before it.
+        '''
+        outputs = sorted(name for name, mtime in self.snapshot(path).items() if before.get(name) != mtime)
+        entry = {'path': os.path.abspath(path), 'digest': self.digest(path, command), 'outputs': outputs,
+                 'output': (output or b'').decode(errors='replace')}
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.entry_filename(path)
+        # write then rename, so that concurrent builds never leave a partial entry
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False) as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(entry_file.name, filename)
+
+
+def build_lock(path):
+    '''
+    Returns the lock held while the pokerbot directory at path is being built.
+    '''
+    with BUILD_LOCKS_LOCK:
+        return BUILD_LOCKS.setdefault(os.path.abspath(path), Lock())
+
+
+def bot_location(path):
+    '''
+    Splits a pokerbot path into its directory and, if the path names one Python script inside a
+    pokerbot directory (such as an older version kept beside the current one), that script.
+    '''
+    if path is not None and path.endswith('.py'):
+        directory, script = os.path.split(path)
+        return directory or '.', script
+    return path, None
 
 
 class Player():
     '''
     Handles subprocess and socket interactions with one player's pokerbot.
+
+    The path is either a pokerbot directory or a Python script inside one. A script is run in
+    place of the script named in the directory's "run" command.
     '''
+    # whether both players of a game may be built, started and stopped at the same time
+    CONCURRENT_LIFECYCLE = True
 
-    def __init__(self, name, path):
-        self.name = name
-        self.path = path
-        self.game_clock = STARTING_GAME_CLOCK
-        self.bankroll = 0
+    def __init__(self, name, path, log_dir='.', transport=None, keep_alive=False, config=None):
+        self.config = GameConfig() if config is None else config
+        self.path, self.script = bot_location(path)
+        self.transport = self.config.TRANSPORT if transport is None else transport
+        self.keep_alive = keep_alive
         self.commands = None
         self.bot_subprocess = None
         self.socketfile = None
-        self.bytes_queue = Queue()
+        self.build_cache = BuildCache(self.config.BUILD_CACHE_DIR) if self.config.BUILD_CACHE_DIR is not None else None
+        self.start_match(name, log_dir)
 
-    def build(self):
+    def start_match(self, name, log_dir='.', config=None):
+        '''
+        Resets the per-match state, so that a pokerbot kept alive can play its next match, which may
+        have a different config.
+        '''
+        if config is not None:
+            self.config = config
+        self.name = name
+        self.log_dir = log_dir
+        self.latency = LatencyStats()
+        self.game_clock = self.config.STARTING_GAME_CLOCK
+        self.bankroll = 0
+        self.adjusted_bankroll = 0.
+        log_size_limit = self.config.PLAYER_LOG_SIZE_LIMIT
+        self.output = OutputCapture(log_size_limit // 2, log_size_limit - log_size_limit // 2,
+                                    os.path.join(log_dir, name + '.txt'), self.config.STREAM_PLAYER_LOGS)
+
+    def connected(self):
+        '''
+        Returns whether the pokerbot is running and connected.
+        '''
+        return self.socketfile is not None
+
+    def stays_alive(self):
+        '''
+        Returns whether the pokerbot should be left running for another match when this one ends.
+
+        A pokerbot which ran out of time or disconnected is always stopped.
         '''
-        Loads the commands file and builds the pokerbot.
+        return self.keep_alive and self.game_clock > 0. and self.connected()
+
+    def load_commands(self):
+        '''
+        Loads and validates the commands file.
         '''
         try:
             with open(self.path + '/commands.json', 'r') as json_file:
@@ -265,74 +606,202 @@ class Player():
                     isinstance(commands['build'], list) and
                     isinstance(commands['run'], list)):
                 self.commands = commands
+                if self.script is not None:
+                    scripts = [arg for arg in commands['run'] if isinstance(arg, str) and arg.endswith('.py')]
+                    commands['run'] = ([self.script if arg in scripts else arg for arg in commands['run']]
+                                       if scripts else ['python3', self.script])
             else:
                 print(self.name, 'commands.json missing command')
         except FileNotFoundError:
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
+
+    def build(self):
+        '''
+        Loads the commands file and builds the pokerbot, unless it is still running from a previous match
+        or the build cache shows that nothing has changed since its last successful build.
+        '''
+        if self.connected():
+            return
+        self.load_commands()
         if self.commands is not None and len(self.commands['build']) > 0:
+            # players sharing a directory, as in self-play, build it one at a time, so that only
+            # the first one runs the build and the others find it in the cache
+            with build_lock(self.path):
+                if self.build_cache is not None:
+                    cached_output = self.build_cache.lookup(self.path, self.commands['build'])
+                    if cached_output is not None:
+                        print(self.name, 'build up to date')
+                        self.output.put(cached_output)
+                        return
+                before = self.build_cache.snapshot(self.path) if self.build_cache is not None else None
+                try:
+                    proc = subprocess.run(self.commands['build'],
+                                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                          cwd=self.path, timeout=self.config.BUILD_TIMEOUT, check=False)
+                    self.output.put(proc.stdout)
+                    if proc.returncode == 0 and self.build_cache is not None:
+                        self.build_cache.store(self.path, self.commands['build'], proc.stdout, before)
+                except subprocess.TimeoutExpired as timeout_expired:
+                    error_message = 'Timed out waiting for ' + self.name + ' to build'
+                    print(error_message)
+                    self.output.put(timeout_expired.stdout)
+                    self.output.put(error_message.encode())
+                except (TypeError, ValueError):
+                    print(self.name, 'build command misformatted')
+                except OSError:
+                    print(self.name, 'build failed - check "build" in commands.json')
+
+    def spawn(self, args, **popen_kwargs):
+        '''
+        Starts the pokerbot subprocess and a thread which captures its output.
+        '''
+        output_stream = 'stderr' if self.transport == 'pipe' else 'stdout'
+        popen_kwargs.setdefault(output_stream, subprocess.PIPE)
+        if output_stream == 'stdout':
+            popen_kwargs['stderr'] = subprocess.STDOUT
+        proc = subprocess.Popen(self.commands['run'] + args, cwd=self.path, **popen_kwargs)
+        self.bot_subprocess = proc
+        # function for bot listening
+        def enqueue_output(out):
             try:
-                proc = subprocess.run(self.commands['build'],
-                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
-            except subprocess.TimeoutExpired as timeout_expired:
-                error_message = 'Timed out waiting for ' + self.name + ' to build'
-                print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
-            except (TypeError, ValueError):
-                print(self.name, 'build command misformatted')
-            except OSError:
-                print(self.name, 'build failed - check "build" in commands.json')
+                for line in out:
+                    if self.path == r"./player_chatbot":
+                        print(line.strip().decode("utf-8"))
+                    else:
+                        # a pokerbot kept alive writes into the capture of whichever match it is playing
+                        self.output.put(line)
+            except ValueError:
+                pass
+        # start a separate bot listening thread which dies with the program
+        Thread(target=enqueue_output, args=(getattr(proc, output_stream),), daemon=True).start()
 
     def run(self):
         '''
-        Runs the pokerbot and establishes the socket connection.
+        Runs the pokerbot and establishes the connection over the configured transport.
+
+        The transport is one of "tcp" (a localhost socket, the default), "unix" (a Unix domain
+        socket), "socketpair" (a connected socket inherited by the pokerbot) or "pipe" (the
+        pokerbot's stdin and stdout, in which case its output is captured from stderr).
+
+        A pokerbot still running from a previous match is sent the new match message instead, and is
+        only restarted if it fails to acknowledge it.
         '''
+        if self.connected():
+            if self.send_new_match():
+                print(self.name, 'reused from previous match')
+                return
+            print(self.name, 'failed to start a new match - restarting')
+            self.terminate()
+            self.build()
         if self.commands is not None and len(self.commands['run']) > 0:
+            timeout = self.config.PLAYER_TIMEOUT if self.path == r"./player_chatbot" else self.config.CONNECT_TIMEOUT
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                with server_socket:
-                    server_socket.bind(('', 0))
-                    server_socket.settimeout(CONNECT_TIMEOUT)
-                    server_socket.listen()
-                    port = server_socket.getsockname()[1]
-                    proc = subprocess.Popen(self.commands['run'] + [str(port)],
-                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
-                    self.bot_subprocess = proc
-                    # function for bot listening
-                    def enqueue_output(out, queue):
-                        try:
-                            for line in out:
-                                if self.path == r"./player_chatbot":
-                                    print(line.strip().decode("utf-8"))
-                                else:
-                                    queue.put(line)
-                        except ValueError:
-                            pass
-                    # start a separate bot listening thread which dies with the program
-                    Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
-                    # block until we timeout or the player connects
-                    client_socket, _ = server_socket.accept()
-                    with client_socket:
-                        if self.path == r"./player_chatbot":
-                            client_socket.settimeout(PLAYER_TIMEOUT)
-                        else:
-                            client_socket.settimeout(CONNECT_TIMEOUT)
-                        sock = client_socket.makefile('rw')
-                        self.socketfile = sock
-                        print(self.name, 'connected successfully')
+                if self.transport == 'pipe':
+                    bot_stdin, engine_out = os.pipe()
+                    engine_in, bot_stdout = os.pipe()
+                    try:
+                        self.spawn(['--pipe'], stdin=bot_stdin, stdout=bot_stdout)
+                    except (TypeError, ValueError, OSError):
+                        os.close(engine_in)
+                        os.close(engine_out)
+                        raise
+                    finally:
+                        os.close(bot_stdin)
+                        os.close(bot_stdout)
+                    self.socketfile = PipeFile(engine_in, engine_out, timeout)
+                elif self.transport == 'socketpair':
+                    engine_socket, bot_socket = socket.socketpair()
+                    with bot_socket:
+                        self.spawn(['--fd', str(bot_socket.fileno())], pass_fds=[bot_socket.fileno()])
+                    with engine_socket:
+                        engine_socket.settimeout(timeout)
+                        self.socketfile = engine_socket.makefile('rw')
+                else:
+                    self.socketfile = self.accept_connection(timeout)
+                print(self.name, 'connected successfully')
             except (TypeError, ValueError):
                 print(self.name, 'run command misformatted')
-            except OSError:
-                print(self.name, 'run failed - check "run" in commands.json')
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
+            except OSError:
+                print(self.name, 'run failed - check "run" in commands.json')
+
+    def accept_connection(self, timeout):
+        '''
+        Listens on a TCP or Unix domain socket, runs the pokerbot and waits for it to connect.
+        '''
+        if self.transport == 'unix':
+            socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+            address = os.path.join(socket_dir, self.name + '.sock')
+            server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            with server_socket:
+                if self.transport == 'unix':
+                    server_socket.bind(address)
+                else:
+                    server_socket.bind(('', 0))
+                server_socket.settimeout(self.config.CONNECT_TIMEOUT)
+                server_socket.listen()
+                if self.transport == 'unix':
+                    self.spawn(['--unix', address])
+                else:
+                    self.spawn([str(server_socket.getsockname()[1])])
+                # block until we timeout or the player connects
+                client_socket, _ = server_socket.accept()
+                with client_socket:
+                    client_socket.settimeout(timeout)
+                    if self.transport != 'unix':
+                        # every message is a small write followed by a read, so never delay sends
+                        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    return client_socket.makefile('rw')
+        finally:
+            if self.transport == 'unix':
+                shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def send_new_match(self):
+        '''
+        Tells a pokerbot kept alive that a new match is starting and returns whether it confirmed
+        the reset with N. A skeleton which ignores the N clause acknowledges it with a plain K and
+        would carry its state into the new match, so it does not count.
+        '''
+        try:
+            self.socketfile.write('N\n')
+            self.socketfile.flush()
+            return self.socketfile.readline().strip() == 'N'
+        except OSError:
+            return False
+
+    def save_bot_state(self):
+        '''
+        Asks the pokerbot for its state at a checkpoint and returns it encoded, or '' if it saved nothing.
+
+        Pokerbots whose skeleton has no save_state acknowledge the message with K, which counts as
+        saving nothing. The game clock is not charged.
+        '''
+        if self.socketfile is None or self.game_clock <= 0.:
+            return ''
+        try:
+            self.socketfile.write('X\n')
+            self.socketfile.flush()
+            reply = self.socketfile.readline().strip()
+        except OSError:
+            print('Could not save the state of', self.name)
+            return ''
+        return reply[1:] if reply.startswith('X') else ''
 
     def stop(self):
+        '''
+        Stops the pokerbot, or leaves it running for its next match, and writes its log.
+        '''
+        if not self.stays_alive():
+            self.terminate()
+        self.output.close()
+
+    def terminate(self):
         '''
         Closes the socket connection and stops the pokerbot.
         '''
@@ -344,27 +813,22 @@ class Player():
                 print('Timed out waiting for', self.name, 'to disconnect')
             except OSError:
                 print('Could not close socket connection with', self.name)
+            self.socketfile = None
         if self.bot_subprocess is not None:
             try:
                 if self.path == r"./player_chatbot":
-                    outs, _ = self.bot_subprocess.communicate(timeout=PLAYER_TIMEOUT)
+                    outs, errs = self.bot_subprocess.communicate(timeout=self.config.PLAYER_TIMEOUT)
                 else:
-                    outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
+                    outs, errs = self.bot_subprocess.communicate(timeout=self.config.CONNECT_TIMEOUT)
+                self.output.put(outs)
+                self.output.put(errs)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
-                outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
-            bytes_written = 0
-            for output in self.bytes_queue.queue:
-                try:
-                    bytes_written += log_file.write(output)
-                    if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
-                        break
-                except TypeError:
-                    pass
+                outs, errs = self.bot_subprocess.communicate()
+                self.output.put(outs)
+                self.output.put(errs)
+            self.bot_subprocess = None
 
     def query(self, round_state, player_message, game_log):
         '''
@@ -378,7 +842,7 @@ class Player():
             round_state (RoundState or TerminalState): The current state of the game.
             player_message (list): Messages to be sent to the player bot, including game state
                 information like time remaining, player position, and cards.
-            game_log (list): A list to store game events and error messages.
+            game_log (GameLog): The game log, which receives error messages.
 
         Returns:
             Action: One of FoldAction, CallAction, CheckAction, or RaiseAction representing
@@ -404,17 +868,277 @@ class Player():
                 self.socketfile.flush()
                 clause = self.socketfile.readline().strip()
                 end_time = time.perf_counter()
-                if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
+                self.latency.record(round_state, RESPONSE_NAME(clause), end_time - start_time)
+                if self.config.ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
                     self.game_clock -= end_time - start_time
                 if self.game_clock <= 0.:
                     raise socket.timeout
-                action = DECODE[clause[0]]
+                action = self.decode_action(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
+            except socket.timeout:
+                error_message = self.name + ' ran out of time'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+            except OSError:
+                error_message = self.name + ' disconnected'
+                game_log.append(error_message)
+                print(error_message)
+                self.game_clock = 0.
+        return CheckAction() if CheckAction in legal_actions else FoldAction()
+
+    def decode_action(self, clause, round_state, legal_actions, game_log):
+        '''
+        Decodes the pokerbot's response clause into a legal action.
+
+        Returns None, after logging why, if the response is illegal or misformatted.
+        '''
+        try:
+            action = DECODE[clause[0]]
+            if action in legal_actions:
+                if clause[0] == 'R':
+                    amount = int(clause[1:])
+                    min_raise, max_raise = round_state.raise_bounds()
+                    if min_raise <= amount <= max_raise:
+                        return action(amount)
+                else:
+                    return action()
+            game_log.append(self.name + ' attempted illegal ' + action.__name__)
+        except (IndexError, KeyError, ValueError):
+            game_log.append(self.name + ' response misformatted: ' + str(clause))
+        return None
+
+
+class CaptureWriter():
+    '''
+    File-like object which forwards text written by an in-process pokerbot to its OutputCapture.
+    '''
+
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, text):
+        self.output.put(text.encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class InProcessPlayer(Player):
+    '''
+    Hosts one player's Python pokerbot inside the engine process.
+
+    The pokerbot is driven through its own skeleton Runner, which receives the same message
+    clauses as over the socket, but without any subprocess, socket or text encoding of actions.
+    As in a subprocess, the pokerbot runs in its own directory, so the files it opens by relative
+    paths are its own, and its output goes to its log.
+
+    This removes the cost of the transport, but not of the engine's RoundState or of the Runner
+    rebuilding its own from the clauses, so a match of trivial pokerbots runs at thousands of
+    rounds per second. Strategies which need far more rounds are evaluated on a RoundBatch.
+    '''
+    # loading changes the working directory, sys.path and sys.stdout of the whole engine process
+    CONCURRENT_LIFECYCLE = False
+
+    def __init__(self, name, path, log_dir='.', pokerbot=None, keep_alive=False, config=None):
+        super().__init__(name, path, log_dir, keep_alive=keep_alive, config=config)
+        self.pokerbot = pokerbot
+        self.runner = None
+        self.runner_class = None
+        # the directory the pokerbot was loaded from, None for a pokerbot passed in directly
+        self.directory = None
+        # while attached, the pokerbot's directory and the engine's, between which every query switches
+        self.directories = None
+
+    def start_match(self, name, log_dir='.', config=None):
+        super().start_match(name, log_dir, config)
+        self.stdout = CaptureWriter(self.output)
+
+    def connected(self):
+        return self.runner is not None
+
+    def build(self):
+        '''
+        Loads the commands file and imports the pokerbot from the script named in "run".
+        '''
+        if self.pokerbot is not None:
+            return
+        super().build()
+        if self.commands is None:
+            return
+        scripts = [arg for arg in self.commands['run'] if isinstance(arg, str) and arg.endswith('.py')]
+        if not scripts:
+            print(self.name, 'run command is not a Python script - cannot run in-process')
+            return
+        path = os.path.abspath(self.path)
+        loaded_modules = set(sys.modules)
+        cwd = os.getcwd()
+        sys.path.insert(0, path)
+        try:
+            # the pokerbot may read data files relative to its own directory while it initializes
+            os.chdir(path)
+            spec = importlib.util.spec_from_file_location('pokerbot_' + self.name, os.path.join(path, scripts[0]))
+            module = importlib.util.module_from_spec(spec)
+            with contextlib.redirect_stdout(self.stdout):
+                spec.loader.exec_module(module)
+                self.pokerbot = module.Player()
+            self.runner_class = importlib.import_module('skeleton.runner').Runner
+            self.directory = path
+        except Exception:
+            print(self.name, 'failed to load in-process')
+            traceback.print_exc(file=self.stdout)
+            self.pokerbot = None
+        finally:
+            os.chdir(cwd)
+            sys.path.remove(path)
+            # forget the pokerbot's own modules so that the next pokerbot gets its own skeleton
+            for module_name in set(sys.modules) - loaded_modules:
+                module_file = getattr(sys.modules[module_name], '__file__', None) or ''
+                if os.path.abspath(module_file).startswith(path + os.sep):
+                    del sys.modules[module_name]
+
+    def run(self):
+        '''
+        Attaches a skeleton Runner to the pokerbot, or starts a new match on the one still attached.
+        '''
+        if self.pokerbot is None:
+            return
+        if self.connected():
+            if self.send_new_match():
+                print(self.name, 'reused from previous match')
+                return
+            print(self.name, 'failed to start a new match - reloading')
+            self.terminate()
+            if self.runner_class is not None:
+                # the pokerbot was loaded from its directory, so load a fresh one
+                self.pokerbot = None
+                self.build()
+            if self.pokerbot is None:
+                return
+        runner_class = self.runner_class
+        if runner_class is None:
+            # the pokerbot was passed in directly, so use the skeleton it was written against
+            for cls in type(self.pokerbot).__mro__:
+                if cls.__name__ == 'Bot':
+                    runner_module = cls.__module__.rpartition('.')[0] + '.runner'
+                    runner_class = importlib.import_module(runner_module).Runner
+                    break
+        self.runner = runner_class(self.pokerbot, None)
+        self.close_directories()
+        if self.directory is not None:
+            if os.chdir in os.supports_fd:
+                # switching by file descriptor is several times cheaper than by path
+                self.directories = os.open(self.directory, os.O_RDONLY), os.open('.', os.O_RDONLY)
+            else:
+                self.directories = self.directory, os.getcwd()
+        print(self.name, 'loaded in-process')
+
+    def close_directories(self):
+        '''
+        Closes the directories the queries switch between.
+        '''
+        if self.directories is not None:
+            for directory in self.directories:
+                if isinstance(directory, int):
+                    os.close(directory)
+            self.directories = None
+
+    @contextlib.contextmanager
+    def pokerbot_context(self):
+        '''
+        Runs pokerbot code in its own directory, with its output going to its log.
+        '''
+        cwd = os.getcwd()
+        with contextlib.redirect_stdout(self.stdout):
+            if self.directory is not None:
+                os.chdir(self.directory)
+            try:
+                yield
+            finally:
+                os.chdir(cwd)
+
+    def send_new_match(self):
+        try:
+            with self.pokerbot_context():
+                return self.runner.new_match() == 'N'
+        except Exception:
+            traceback.print_exc(file=self.stdout)
+            return False
+
+    def save_bot_state(self):
+        if self.runner is None or self.game_clock <= 0.:
+            return ''
+        try:
+            with self.pokerbot_context():
+                return self.runner.save_state()[1:]
+        except Exception:
+            traceback.print_exc(file=self.stdout)
+            return ''
+
+    def terminate(self):
+        '''
+        Signals the end of the game to the pokerbot.
+        '''
+        if self.runner is not None:
+            try:
+                with self.pokerbot_context():
+                    self.runner.handle_packet(['Q'])
+            except Exception:
+                traceback.print_exc(file=self.stdout)
+            self.runner = None
+        self.close_directories()
+        super().terminate()
+
+    def query(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the in-process pokerbot.
+
+        Mirrors Player.query: the same clauses are handed to the pokerbot's Runner, the game clock
+        is charged for the time spent inside the pokerbot, and illegal actions are replaced by
+        CheckAction or FoldAction. A pokerbot that raises an exception is treated as disconnected.
+        '''
+        legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        if self.runner is not None and self.game_clock > 0.:
+            player_message[0] = 'T{:.3f}'.format(self.game_clock)
+            packet = list(player_message)
+            del player_message[1:]  # do not send redundant action history
+            bot_action = None
+            try:
+                # pokerbot_context() by hand, as it would cost more than the rest of a query
+                directories = self.directories
+                engine_stdout = sys.stdout
+                start_time = time.perf_counter()
+                try:
+                    sys.stdout = self.stdout
+                    if directories is not None:
+                        os.chdir(directories[0])
+                    bot_action = self.runner.handle_packet(packet)
+                except Exception as exception:
+                    # an in-process pokerbot crashing is the same as a subprocess disconnecting
+                    traceback.print_exc(file=self.stdout)
+                    raise OSError from exception
+                finally:
+                    sys.stdout = engine_stdout
+                    if directories is not None:
+                        os.chdir(directories[1])
+                end_time = time.perf_counter()
+                response_name = type(bot_action).__name__
+                self.latency.record(round_state, response_name if response_name in ACTION_TYPES else 'Misformatted',
+                                    end_time - start_time)
+                if self.config.ENFORCE_GAME_CLOCK:
+                    self.game_clock -= end_time - start_time
+                if self.game_clock <= 0.:
+                    raise socket.timeout
+                action = ACTION_TYPES[response_name]
                 if action in legal_actions:
-                    if clause[0] == 'R':
-                        amount = int(clause[1:])
+                    if action is RaiseAction:
+                        if not isinstance(bot_action.amount, int):
+                            raise ValueError
                         min_raise, max_raise = round_state.raise_bounds()
-                        if min_raise <= amount <= max_raise:
-                            return action(amount)
+                        if min_raise <= bot_action.amount <= max_raise:
+                            return action(bot_action.amount)
                     else:
                         return action()
                 game_log.append(self.name + ' attempted illegal ' + action.__name__)
@@ -428,37 +1152,357 @@ class Player():
                 game_log.append(error_message)
                 print(error_message)
                 self.game_clock = 0.
-            except (IndexError, KeyError, ValueError):
-                game_log.append(self.name + ' response misformatted: ' + str(clause))
+                self.runner = None
+            except (KeyError, ValueError):
+                game_log.append(self.name + ' response misformatted: ' + str(bot_action))
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
 
+class BotPool():
+    '''
+    Keeps pokerbots running between matches, so that each one pays for its startup only once.
+
+    Players are checked out for a match and checked back in when it ends. A pokerbot checked out
+    again is sent the new match message instead of being rebuilt and restarted.
+    '''
+
+    def __init__(self, player_class=Player):
+        self.player_class = player_class
+        self.idle = {}
+
+    @staticmethod
+    def key(directory, script):
+        '''
+        Identifies a pokerbot by its absolute directory and the script it runs.
+        '''
+        return os.path.abspath(directory), script
+
+    def checkout(self, name, path, log_dir='.', config=None):
+        '''
+        Returns a player for the pokerbot at path, reusing an idle one if there is one.
+        '''
+        idle = self.idle.get(self.key(*bot_location(path)))
+        if idle:
+            player = idle.pop()
+            player.start_match(name, log_dir, config)
+            return player
+        return self.player_class(name, path, log_dir, keep_alive=True, config=config)
+
+    def checkin(self, players):
+        '''
+        Returns players to the pool after their match. Pokerbots which were stopped are dropped.
+        '''
+        for player in players:
+            if player.connected():
+                self.idle.setdefault(self.key(player.path, player.script), []).append(player)
+
+    def close(self):
+        '''
+        Stops every idle pokerbot.
+        '''
+        for idle in self.idle.values():
+            for player in idle:
+                player.terminate()
+        self.idle.clear()
+
+
+class GameLog():
+    '''
+    Streams the game log to disk, holding at most one round of lines in memory.
+
+    A disabled log drops every line, and callers check `enabled` to skip formatting them at all.
+    Given the offset of a checkpoint, the log continues an existing file from that offset.
+    '''
+
+    def __init__(self, filename, enabled=True, offset=None):
+        self.filename = filename
+        self.enabled = enabled
+        self.lines = []
+        self.log_file = None
+        if enabled and offset:
+            # drop whatever the interrupted match logged after its checkpoint
+            self.log_file = open(filename, 'r+')
+            self.log_file.truncate(offset)
+            self.log_file.seek(offset)
+
+    def append(self, line):
+        '''
+        Buffers one line until the end of the round.
+        '''
+        if self.enabled:
+            self.lines.append(line)
+
+    def flush(self):
+        '''
+        Writes the buffered lines to the log file.
+        '''
+        if not self.lines:
+            return
+        if self.log_file is None:
+            self.log_file = open(self.filename, 'w')
+        else:
+            self.log_file.write('\n')
+        self.log_file.write('\n'.join(self.lines))
+        self.log_file.flush()
+        self.lines = []
+
+    def offset(self):
+        '''
+        Returns the size of the flushed log, where a resumed match continues it.
+        '''
+        return self.log_file.tell() if self.log_file is not None else 0
+
+    def close(self):
+        '''
+        Writes any remaining lines and closes the log file.
+        '''
+        self.flush()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+class DealSchedule():
+    '''
+    Pre-generates the cards and bounties of every round of a match from a master seed.
+
+    Each round is stored as 11 bytes: the 9 cards it can use (both hands, then the board) as
+    indices into an unshuffled eval7.Deck, followed by the bounty rank of each seat. Every round
+    and bounty block is drawn from its own generator seeded from the master seed, so any round
+    can be regenerated and replayed on its own, and shards of a match deal identical cards.
+    '''
+    CARDS_PER_ROUND = 9
+    ROUND_SIZE = CARDS_PER_ROUND + 2
+
+    def __init__(self, seed, num_rounds, duplicate=False, rounds_per_bounty=DEFAULT_CONFIG.ROUNDS_PER_BOUNTY):
+        self.seed = seed
+        self.num_rounds = num_rounds
+        self.duplicate = duplicate
+        self.rounds_per_bounty = rounds_per_bounty
+        self.deals = array('B')
+        for round_num in range(1, num_rounds + 1):
+            self.deals.extend(self.generate(round_num))
+
+    def is_duplicate(self, round_num):
+        '''
+        Returns whether the round replays the previous round's cards with the seats swapped.
+        '''
+        return self.duplicate and round_num % 2 == 0
+
+    def bounty_block(self, round_num):
+        '''
+        Returns the index of the bounty block a round belongs to.
+
+        A duplicate round always shares the block of the round it replays.
+        '''
+        if self.is_duplicate(round_num):
+            round_num -= 1
+        return (round_num - 1) // self.rounds_per_bounty
+
+    def resets_bounties(self, round_num):
+        '''
+        Returns whether new bounties are drawn at the start of the round.
+        '''
+        return round_num == 1 or self.bounty_block(round_num) != self.bounty_block(round_num - 1)
+
+    def generate(self, round_num):
+        '''
+        Draws the cards and seat bounties of one round from the master seed.
+        '''
+        original_round = round_num - 1 if self.is_duplicate(round_num) else round_num
+        deck_rng = random.Random('{}:deck:{}'.format(self.seed, original_round))
+        cards = deck_rng.sample(range(len(DECK_CARDS)), self.CARDS_PER_ROUND)
+        bounty_rng = random.Random('{}:bounty:{}'.format(self.seed, self.bounty_block(round_num)))
+        # bounties belong to the players, who swap seats every round; duplicate rounds keep the
+        # seat bounties of the round they replay, so the bounties go with the cards
+        bounties = [bounty_rng.randrange(len(RANK_NAMES)), bounty_rng.randrange(len(RANK_NAMES))]
+        if original_round % 2 == 0:
+            bounties.reverse()
+        return cards + bounties
+
+    def deal(self, round_num):
+        '''
+        Returns a deck stacked with the round's cards and the bounty rank of each seat.
+        '''
+        offset = (round_num - 1) * self.ROUND_SIZE
+        deal = self.deals[offset:offset + self.ROUND_SIZE]
+        # skip Deck.__init__, which would build 52 cards only for them to be replaced
+        deck = eval7.Deck.__new__(eval7.Deck)
+        deck.cards = [DECK_CARDS[index] for index in deal[:self.CARDS_PER_ROUND]]
+        bounties = [RANK_NAMES[rank] for rank in deal[self.CARDS_PER_ROUND:]]
+        return deck, bounties
+
+
 class Game():
     '''
     Manages logging and the high-level game procedure.
+
+    Settings are read from config, a GameConfig which defaults to config.py. The keyword
+    arguments override the matching settings of config when they are not None.
+
+    Every CHECKPOINT_ROUNDS rounds the game saves its progress and the pokerbots' states to a
+    checkpoint file. With resume, a game whose output_dir holds a checkpoint continues from it.
     '''
 
-    def __init__(self):
-        self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
+    def __init__(self, players=None, output_dir='.', duplicate=None, seed=None, rounds=None,
+                 write_log=None, write_history=None, write_latency=None,
+                 auto_advance=None, all_in_equity=None, early_stopping=None, config=None, resume=False):
+        self.config = config = GameConfig() if config is None else config
+        setting = lambda value, name: getattr(config, name) if value is None else value
+        duplicate = setting(duplicate, 'DUPLICATE_DEALS')
+        seed = setting(seed, 'SEED')
+        if players is None:
+            player_class = InProcessPlayer if config.IN_PROCESS_BOTS else Player
+            players = [
+                player_class(config.PLAYER_1_NAME, config.PLAYER_1_PATH, output_dir, config=config),
+                player_class(config.PLAYER_2_NAME, config.PLAYER_2_PATH, output_dir, config=config)
+            ]
+        self.players = players
+        self.output_dir = output_dir
+        self.checkpoint_filename = os.path.join(output_dir, config.GAME_LOG_FILENAME + '_checkpoint.json')
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint is not None:
+            seed = checkpoint['seed']
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.schedule = DealSchedule(self.seed, config.NUM_ROUNDS, duplicate, config.ROUNDS_PER_BOUNTY)
+        self.rounds = list(range(1, config.NUM_ROUNDS + 1)) if rounds is None else list(rounds)
+        self.log = GameLog(os.path.join(output_dir, config.GAME_LOG_FILENAME + '.txt'), setting(write_log, 'WRITE_GAME_LOG'),
+                           None if checkpoint is None else checkpoint['log_offset'])
+        if checkpoint is None:
+            self.log.append('6.9630 MIT Pokerbots - ' + players[0].name + ' vs ' + players[1].name)
+            self.log.append('Deal schedule seed: ' + str(self.seed))
+        self.write_latency = setting(write_latency, 'WRITE_LATENCY_STATS')
+        self.auto_advance = setting(auto_advance, 'AUTO_ADVANCE_ALL_IN')
+        self.all_in_equity = setting(all_in_equity, 'ALL_IN_EQUITY')
+        self.stopping_test = None
+        if setting(early_stopping, 'EARLY_STOPPING'):
+            # duplicate rounds are judged in pairs, so a pair counts as one observation
+            min_rounds = config.EARLY_STOPPING_MIN_ROUNDS
+            min_observations = min_rounds // 2 if duplicate else min_rounds
+            self.stopping_test = SequentialTest(config.EARLY_STOPPING_ALPHA, config.EARLY_STOPPING_TOLERANCE, min_observations)
+        self.observed_bankroll = 0.
+        self.pending_delta = 0.
+        self.history = None
+        if setting(write_history, 'WRITE_HAND_HISTORY'):
+            self.history = HandHistoryWriter(os.path.join(output_dir, config.GAME_LOG_FILENAME + '.jsonl'),
+                                             [player.name for player in players], self.seed,
+                                             None if checkpoint is None else checkpoint['history'])
         self.player_messages = [[], []]
+        self.new_match = True
+        self.resume_clauses = {}
+        self.phase_times = {}
+        if self.rounds[0] > 1:
+            # a game which starts partway through the match, such as one shard of it, tells the
+            # pokerbots which round they start at, with no saved state to restore
+            for player in players:
+                self.resume_clauses[player.name] = 'Z{},{},'.format(self.rounds[0], player.bankroll)
+        if checkpoint is not None:
+            self.restore_checkpoint(checkpoint)
+
+    def load_checkpoint(self):
+        '''
+        Returns the checkpoint left in the output directory by an interrupted game, or None.
+        '''
+        try:
+            with open(self.checkpoint_filename, 'r') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def checkpoint_due(self, round_num):
+        '''
+        Returns whether to write a checkpoint after the round.
+        '''
+        interval = self.config.CHECKPOINT_ROUNDS
+        return bool(interval) and round_num % interval == 0 and round_num != self.rounds[-1]
+
+    def checkpoint(self, round_num):
+        '''
+        Saves the game after the round, with the state of each pokerbot.
+        '''
+        self.write_checkpoint(round_num, {player.name: player.save_bot_state() for player in self.players})
+
+    def write_checkpoint(self, round_num, bot_states):
+        '''
+        Writes the checkpoint file, replacing the previous checkpoint atomically.
+
+        Cards are dealt from the seed round by round, so the seed and the round number fix the
+        position of the deal schedule; the bounties are kept to check that they still agree.
+        '''
+        players = self.seating(round_num)
+        _, bounties = self.schedule.deal(round_num)
+        checkpoint = {
+            'round': round_num,
+            'seed': self.seed,
+            'log_offset': self.log.offset(),
+            'history': None if self.history is None else self.history.checkpoint(),
+            'players': {player.name: {'bankroll': player.bankroll, 'adjusted_bankroll': player.adjusted_bankroll,
+                                      'game_clock': player.game_clock, 'bounty': bounty, 'state': bot_states[player.name]}
+                        for player, bounty in zip(players, bounties)},
+            'stopping_test': None,
+        }
+        if self.stopping_test is not None:
+            checkpoint['stopping_test'] = {'count': self.stopping_test.count, 'mean': self.stopping_test.mean,
+                                           'sum_squares': self.stopping_test.sum_squares,
+                                           'observed_bankroll': self.observed_bankroll, 'pending_delta': self.pending_delta}
+        with tempfile.NamedTemporaryFile('w', dir=self.output_dir, delete=False) as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(checkpoint_file.name, self.checkpoint_filename)
+
+    def restore_checkpoint(self, checkpoint):
+        '''
+        Continues the game after the checkpoint's round, with the players' bankrolls and clocks as
+        they were, and prepares the Z clause which hands each pokerbot back its state.
+        '''
+        round_num = checkpoint['round']
+        _, bounties = self.schedule.deal(round_num)
+        saved = checkpoint['players']
+        if (sorted(saved) != sorted(player.name for player in self.players) or
+                [saved[player.name]['bounty'] for player in self.seating(round_num)] != bounties):
+            raise ValueError('checkpoint ' + self.checkpoint_filename + ' does not match this game')
+        self.rounds = [later_round for later_round in self.rounds if later_round > round_num]
+        for player in self.players:
+            player.bankroll = saved[player.name]['bankroll']
+            player.adjusted_bankroll = saved[player.name]['adjusted_bankroll']
+            player.game_clock = saved[player.name]['game_clock']
+            self.resume_clauses[player.name] = 'Z{},{},{}'.format(round_num + 1, player.bankroll, saved[player.name]['state'])
+        if self.stopping_test is not None and checkpoint['stopping_test'] is not None:
+            test_state = checkpoint['stopping_test']
+            self.stopping_test.count = test_state['count']
+            self.stopping_test.mean = test_state['mean']
+            self.stopping_test.sum_squares = test_state['sum_squares']
+            self.observed_bankroll = test_state['observed_bankroll']
+            self.pending_delta = test_state['pending_delta']
+        self.log.append('')
+        self.log.append('Resumed from checkpoint after round #' + str(round_num))
+        print('Resuming after round #' + str(round_num))
 
     def log_round_state(self, players, round_state):
         '''
         Incorporates RoundState information into the game log and player messages.
         '''
         if round_state.street == 0 and round_state.button == 0:
-            self.log.append('{} posts the blind of {}'.format(players[0].name, SMALL_BLIND))
-            self.log.append('{} posts the blind of {}'.format(players[1].name, BIG_BLIND))
-            self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
-            self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
+            if self.log.enabled:
+                self.log.append('{} posts the blind of {}'.format(players[0].name, self.config.SMALL_BLIND))
+                self.log.append('{} posts the blind of {}'.format(players[1].name, self.config.BIG_BLIND))
+                self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
+                self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
             self.player_messages[0] = ['T0.', 'P0', 'H' + CCARDS(round_state.hands[0]), 'G' + round_state.bounties[0]]
             self.player_messages[1] = ['T0.', 'P1', 'H' + CCARDS(round_state.hands[1]), 'G' + round_state.bounties[1]]
+            if self.new_match:
+                # tell the pokerbots what game they play before their first hand
+                for message, player in zip(self.player_messages, players):
+                    message.insert(1, self.config.parameters_clause())
+                    if player.name in self.resume_clauses:
+                        message.insert(2, self.resume_clauses[player.name])
+                self.new_match = False
         elif round_state.street > 0 and round_state.button == 1:
             board = round_state.deck.peek(round_state.street)
-            self.log.append(STREET_NAMES[round_state.street - 3] + ' ' + PCARDS(board) +
-                            PVALUE(players[0].name, STARTING_STACK-round_state.stacks[0]) +
-                            PVALUE(players[1].name, STARTING_STACK-round_state.stacks[1]))
-            self.log.append(f"Current stacks: {round_state.stacks[0]}, {round_state.stacks[1]}")
+            if self.log.enabled:
+                self.log.append(STREET_NAMES[round_state.street - 3] + ' ' + PCARDS(board) +
+                                PVALUE(players[0].name, self.config.STARTING_STACK-round_state.stacks[0]) +
+                                PVALUE(players[1].name, self.config.STARTING_STACK-round_state.stacks[1]))
+                self.log.append(f"Current stacks: {round_state.stacks[0]}, {round_state.stacks[1]}")
             compressed_board = 'B' + CCARDS(board)
             self.player_messages[0].append(compressed_board)
             self.player_messages[1].append(compressed_board)
@@ -479,7 +1523,8 @@ class Game():
         else:  # isinstance(action, RaiseAction)
             phrasing = (' bets ' if bet_override else ' raises to ') + str(action.amount)
             code = 'R' + str(action.amount)
-        self.log.append(name + phrasing)
+        if self.log.enabled:
+            self.log.append(name + phrasing)
         self.player_messages[0].append(code)
         self.player_messages[1].append(code)
 
@@ -489,12 +1534,14 @@ class Game():
         '''
         previous_state = round_state.previous_state
         if FoldAction not in previous_state.legal_actions():
-            self.log.append('{} shows {}'.format(players[0].name, PCARDS(previous_state.hands[0])))
-            self.log.append('{} shows {}'.format(players[1].name, PCARDS(previous_state.hands[1])))
+            if self.log.enabled:
+                self.log.append('{} shows {}'.format(players[0].name, PCARDS(previous_state.hands[0])))
+                self.log.append('{} shows {}'.format(players[1].name, PCARDS(previous_state.hands[1])))
             self.player_messages[0].append('O' + CCARDS(previous_state.hands[1]))
             self.player_messages[1].append('O' + CCARDS(previous_state.hands[0]))
-        self.log.append('{} awarded {}'.format(players[0].name, round_state.deltas[0]))
-        self.log.append('{} awarded {}'.format(players[1].name, round_state.deltas[1]))
+        if self.log.enabled:
+            self.log.append('{} awarded {}'.format(players[0].name, round_state.deltas[0]))
+            self.log.append('{} awarded {}'.format(players[1].name, round_state.deltas[1]))
         self.player_messages[0].append('D' + str(round_state.deltas[0]))
         self.player_messages[1].append('D' + str(round_state.deltas[1]))
 
@@ -516,32 +1563,183 @@ class Game():
         self.player_messages[0].append('Y' + hit_chars[0] + hit_chars[1])
         self.player_messages[1].append('Y' + hit_chars[1] + hit_chars[0])
 
-    def run_round(self, players, bounties):
+    def seating(self, round_num):
+        '''
+        Returns the players in seat order for a round; the players swap seats every round.
         '''
-        Runs one round of poker.
+        return list(self.players) if round_num % 2 == 1 else self.players[::-1]
+
+    def round_queries(self, players, bounties, deck, round_num):
         '''
-        deck = eval7.Deck()
-        deck.shuffle()
+        Plays one round of poker with the given shuffled deck as a generator of player queries.
+
+        Yields the active player's index and the RoundState whenever a player must act, and
+        expects that player's action to be sent back in. At the end of the round it yields each
+        player's index with the TerminalState, for which the response is only an acknowledgement.
+
+        With auto_advance, spots where the only sensible action is to check, because a player is
+        all-in and nothing is left to call, are checked without a query. The checks still go into
+        the action history, so the pokerbots see them in their next message.
+
+        With all_in_equity, a round in which both players are all-in before the river is also
+        scored by the players' exact equity over every runout, and that expected delta rather
+        than the delta actually dealt is added to each player's adjusted_bankroll.
+        '''
+        actions = []
         hands = [deck.deal(2), deck.deal(2)]
-        pips = [SMALL_BLIND, BIG_BLIND]
-        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-        round_state = RoundState(0, 0, pips, stacks, hands, deck, bounties, None)
+        config = self.config
+        pips = [config.SMALL_BLIND, config.BIG_BLIND]
+        stacks = [config.STARTING_STACK - config.SMALL_BLIND, config.STARTING_STACK - config.BIG_BLIND]
+        round_state = RoundState(0, 0, pips, stacks, hands, deck, bounties, None, config)
+        expected_delta = None
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
             active = round_state.button % 2
             player = players[active]
-            action = player.query(round_state, self.player_messages[active], self.log)
+            if self.auto_advance and round_state.legal_actions() == {CheckAction, FoldAction}:
+                action = CheckAction()
+            else:
+                action = yield active, round_state
             bet_override = (round_state.pips == [0, 0])
             self.log_action(player.name, action, bet_override)
+            actions.append((round_state.street, active, action))
+            street = round_state.street
             round_state = round_state.proceed(action)
+            if (self.all_in_equity and isinstance(action, CallAction) and street < 5 and
+                    isinstance(round_state, RoundState) and round_state.stacks == [0, 0]):
+                expected_delta = round_state.expected_delta(street)
         self.log_terminal_state(players, round_state)
-        for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
-            player.query(round_state, player_message, self.log)
-            player.bankroll += delta
+        adjusted_deltas = list(round_state.deltas)
+        if expected_delta is not None and not isinstance(actions[-1][2], FoldAction):
+            adjusted_deltas = [expected_delta, -expected_delta]
+            if self.log.enabled:
+                self.log.append('All-in equity' + PVALUE(players[0].name, '{:.2f}'.format(expected_delta)) +
+                                PVALUE(players[1].name, '{:.2f}'.format(-expected_delta)))
+        if self.history is not None:
+            final_state = round_state.previous_state
+            board = deck.peek(final_state.street) if final_state.street > 0 else []
+            self.history.write_round(round_num, [player.name for player in players], hands, board, bounties,
+                                     actions, round_state.deltas, round_state.bounty_hits,
+                                     adjusted_deltas if adjusted_deltas != round_state.deltas else None)
+        for active, player in enumerate(players):
+            yield active, round_state
+            player.bankroll += round_state.deltas[active]
+            player.adjusted_bankroll += adjusted_deltas[active]
+
+    def run_round(self, players, bounties, deck, round_num):
+        '''
+        Runs one round of poker with the given shuffled deck.
+        '''
+        queries = self.round_queries(players, bounties, deck, round_num)
+        action = None
+        while True:
+            try:
+                active, round_state = queries.send(action)
+            except StopIteration:
+                return
+            action = players[active].query(round_state, self.player_messages[active], self.log)
+
+    def start_round(self, round_num):
+        '''
+        Seats the players and deals one round, returning the seated players, bounties and deck.
+        '''
+        players = self.seating(round_num)
+        deck, bounties = self.schedule.deal(round_num)
+        if self.log.enabled:
+            self.log.append('')
+            self.log.append('Round #' + str(round_num) + STATUS(players))
+            if self.schedule.is_duplicate(round_num):
+                self.log.append('Duplicate of round #' + str(round_num - 1) + ' with seats swapped')
+            elif round_num == self.rounds[0] or self.schedule.resets_bounties(round_num):
+                self.log.append(f"Bounties reset to {bounties[0]} for player {players[0].name} and {bounties[1]} for player {players[1].name}")
+        return players, bounties, deck
+
+    def end_round(self, players, round_num):
+        '''
+        Logs the running bankrolls and flushes the round to the game log.
+
+        With early stopping, also feeds the round to the sequential test, and returns True if the
+        game should end after this round, which then becomes the last of self.rounds.
+        '''
+        if self.log.enabled:
+            self.log.append('Winning counts at the end of the round: ' + STATUS(players))
+        stop = False
+        if self.stopping_test is not None:
+            # the all-in adjusted bankroll equals the real one unless all-in equity is on
+            adjusted_bankroll = self.players[0].adjusted_bankroll
+            self.pending_delta += adjusted_bankroll - self.observed_bankroll
+            self.observed_bankroll = adjusted_bankroll
+            if not self.schedule.is_duplicate(round_num + 1):
+                self.stopping_test.update(self.pending_delta / (2 if self.schedule.is_duplicate(round_num) else 1))
+                self.pending_delta = 0.
+                decision = self.stopping_test.decision()
+                if decision is not None:
+                    verdict = 'bots are equivalent' if decision == 'equivalent' else self.players['AB'.index(decision)].name + ' is better'
+                    message = 'Stopping after round #{}: {}, {} for {}'.format(
+                        round_num, verdict, self.stopping_test.summary(), self.players[0].name)
+                    print(message)
+                    self.log.append(message)
+                    del self.rounds[self.rounds.index(round_num) + 1:]
+                    stop = True
+        self.log.flush()
+        return stop
+
+    def run_phase(self, phase, players, method):
+        '''
+        Calls the named method of every player, in parallel threads where the players allow it, and records
+        the wall time of the phase and the time each player took.
+        '''
+        times = {}
+
+        def timed(player):
+            start_time = time.perf_counter()
+            getattr(player, method)()
+            times[player.name] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        if all(player.CONCURRENT_LIFECYCLE for player in players):
+            threads = [Thread(target=timed, args=(player,)) for player in players]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for player in players:
+                timed(player)
+        self.phase_times[phase] = {'wall': time.perf_counter() - start_time, 'players': times}
+
+    def report_phases(self):
+        '''
+        Prints the time spent building, connecting, playing and shutting down.
+        '''
+        for phase, times in self.phase_times.items():
+            player_times = ', '.join('{} {:.3f}s'.format(name, seconds) for name, seconds in times['players'].items())
+            print('Phase {}: {:.3f}s'.format(phase, times['wall']) + (' (' + player_times + ')' if player_times else ''))
+
+    def finish(self):
+        '''
+        Closes the game log and hand history and returns the final bankroll of each player by name.
+        '''
+        players = self.seating(self.rounds[-1] + 1)
+        self.log.append('')
+        self.log.append('Final' + STATUS(players))
+        if self.all_in_equity:
+            self.log.append('Final all-in adjusted' + ''.join(PVALUE(player.name, '{:.2f}'.format(player.adjusted_bankroll))
+                                                              for player in players))
+        if self.log.enabled:
+            print('Writing', self.log.filename)
+        self.log.close()
+        if self.history is not None:
+            self.history.close()
+        if self.write_latency:
+            with open(os.path.join(self.output_dir, self.config.GAME_LOG_FILENAME + '_latency.json'), 'w') as latency_file:
+                json.dump({player.name: player.latency.report() for player in players}, latency_file, indent=2)
+        if os.path.exists(self.checkpoint_filename):
+            os.remove(self.checkpoint_filename)
+        return {player.name: player.bankroll for player in players}
 
     def run(self):
         '''
-        Runs one game of poker.
+        Runs one game of poker and returns the final bankroll of each player by name.
         '''
         print('   __  _____________  ___       __           __        __    ')
         print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
@@ -549,35 +1747,41 @@ class Game():
         print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
         print()
         print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
-        bounties = [-1, -1]
-        for player in players:
-            player.build()
-            player.run()
-        for round_num in range(1, NUM_ROUNDS + 1):
-            self.log.append('')
-            self.log.append('Round #' + str(round_num) + STATUS(players))
-            if round_num % ROUNDS_PER_BOUNTY == 1:
-                cardNames = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-                bounties = [cardNames[random.randint(0, 12)], cardNames[random.randint(0, 12)]]
-                self.log.append(f"Bounties reset to {bounties[0]} for player {players[0].name} and {bounties[1]} for player {players[1].name}")
-            self.run_round(players, bounties)
-            self.log.append('Winning counts at the end of the round: ' + STATUS(players))
+        self.run_phase('build', self.players, 'build')
+        self.run_phase('connect', self.players, 'run')
+        start_time = time.perf_counter()
+        for round_num in self.rounds:
+            players, bounties, deck = self.start_round(round_num)
+            self.run_round(players, bounties, deck, round_num)
+            if self.end_round(players, round_num):
+                break
+            if self.checkpoint_due(round_num):
+                self.checkpoint(round_num)
+        self.phase_times['play'] = {'wall': time.perf_counter() - start_time, 'players': {}}
+        self.run_phase('shutdown', self.seating(self.rounds[-1] + 1), 'stop')
+        self.report_phases()
+        return self.finish()
 
-            players = players[::-1]
-            bounties = bounties[::-1]
-        self.log.append('')
-        self.log.append('Final' + STATUS(players))
-        for player in players:
-            player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
-            log_file.write('\n'.join(self.log))
+
+def parse_args():
+    '''
+    Parses the engine's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 engine.py')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted game from its checkpoint')
+    parser.add_argument('--profile', action='store_true', help='Report where the engine spends its time')
+    parser.add_argument('--profile-stacks', type=str, default=None, metavar='FILE',
+                        help='With --profile, also write the timed sections in collapsed flame graph format')
+    parser.add_argument('--cprofile', type=str, default=None, metavar='FILE',
+                        help='With --profile, also write a cProfile of the engine process')
+    add_config_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    Game().run()
+    args = parse_args()
+    game = Game(config=config_from_args(args), resume=args.resume)
+    if args.profile:
+        EngineProfiler().profile(game, args.profile_stacks, args.cprofile)
+    else:
+        game.run()
@@ -0,0 +1,312 @@
+'''
+Exact enumeration of the runouts of an all-in round, for all-in equity ("luck-adjusted") results.
+
+Every possible completion of the board is evaluated for both hands, and the runouts are counted
+by outcome: which player wins (2 for a split pot) and whether each player hits their bounty.
+Weighting each outcome by its delta under the bounty rules gives the expected delta of the round.
+
+With NumPy installed all runouts are evaluated at once by a vectorized seven card evaluator, which
+takes a fraction of a second even for a preflop all-in. Without NumPy every runout is evaluated
+with eval7 one at a time, which gives the same counts but takes seconds before the flop.
+'''
+from functools import lru_cache
+import itertools
+import math
+import eval7
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RANKS = '23456789TJQKA'
+FULL_DECK = eval7.Deck().cards
+RANK_BITS = 13
+RANK_MASK = (1 << RANK_BITS) - 1
+# the rank bits of each straight, from five high (the wheel, with the ace low) to ace high
+STRAIGHTS = [0b1000000001111] + [0b11111 << low for low in range(9)]
+# per-rank keys whose sums over any seven ranks are all distinct
+RANK_KEYS = [0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181]
+# bit offsets of the suit counts and bounty counts in a packed card, after its rank key
+SUIT_SHIFT = 23
+BOUNTY_SHIFT = SUIT_SHIFT + 12
+
+
+def remaining_cards(hands, board):
+    '''
+    Returns the cards of the deck which are neither in either hand nor on the board.
+    '''
+    dealt = set(map(str, hands[0] + hands[1] + board))
+    return [card for card in FULL_DECK if str(card) not in dealt]
+
+
+def runout_outcomes_python(hands, board, bounty_ranks):
+    '''
+    Counts the runouts by outcome with eval7, one runout at a time.
+    '''
+    outcomes = {}
+    for runout in itertools.combinations(remaining_cards(hands, board), 5 - len(board)):
+        full_board = board + list(runout)
+        score0 = eval7.evaluate(full_board + hands[0])
+        score1 = eval7.evaluate(full_board + hands[1])
+        winner = 0 if score0 > score1 else 1 if score0 < score1 else 2
+        board_ranks = {card.rank for card in full_board}
+        hits = tuple(bounty_ranks[player] in board_ranks or
+                     any(card.rank == bounty_ranks[player] for card in hands[player]) for player in range(2))
+        outcomes[(winner, hits)] = outcomes.get((winner, hits), 0) + 1
+    return outcomes
+
+
+@lru_cache(maxsize=None)
+def rank_tables():
+    '''
+    Returns lookup tables indexed by a 13 bit rank mask: the number of ranks set, the highest
+    one to five ranks set (index 0 to 5 of the first axis) and the high card of the best straight
+    plus one, or 0 without a straight.
+    '''
+    masks = np.arange(1 << RANK_BITS)
+    popcount = np.zeros(1 << RANK_BITS, dtype=np.uint8)
+    for rank in range(RANK_BITS):
+        popcount += ((masks >> rank) & 1).astype(np.uint8)
+    top = np.zeros((6, 1 << RANK_BITS), dtype=np.int64)
+    remaining = masks.copy()
+    for count in range(1, 6):
+        # the highest set bit of what is left, found by smearing it down and halving
+        smeared = remaining.copy()
+        for shift in (1, 2, 4, 8):
+            smeared |= smeared >> shift
+        highest = smeared - (smeared >> 1)
+        top[count] = top[count - 1] | highest
+        remaining &= ~highest
+    straight = np.zeros(1 << RANK_BITS, dtype=np.int64)
+    for high, straight_mask in enumerate(STRAIGHTS, 4):
+        straight[(masks & straight_mask) == straight_mask] = high
+    return popcount, top, straight
+
+
+@lru_cache(maxsize=64)
+def combinations_array(num_cards, num_chosen):
+    '''
+    Returns every way of choosing num_chosen of num_cards indices, one combination per column.
+
+    Each row is contiguous, so gathering one card of every combination reads memory in order.
+    '''
+    if num_chosen == 0:
+        return np.zeros((0, 1), dtype=np.int8)
+    combinations = np.fromiter(itertools.chain.from_iterable(itertools.combinations(range(num_cards), num_chosen)),
+                               dtype=np.int8).reshape(-1, num_chosen)
+    return np.ascontiguousarray(combinations.T)
+
+
+def add_cards(counts, suits, ranks, suit_indices):
+    '''
+    Adds cards to bit-sliced rank counts and per-suit rank masks, in place.
+
+    counts[n] has the bit of each rank held at least n + 1 times. Ranks and suits may be arrays of
+    one card per runout or single cards shared by every runout.
+    '''
+    bits = np.left_shift(1, ranks).astype(np.int64)
+    counts[3] |= counts[2] & bits
+    counts[2] |= counts[1] & bits
+    counts[1] |= counts[0] & bits
+    counts[0] |= bits
+    suits |= bits << (RANK_BITS * np.asarray(suit_indices, dtype=np.int64))
+
+
+def score_hands(counts, suits):
+    '''
+    Scores seven card hands from their rank counts and suit masks, so that better hands score higher.
+
+    Scores are not eval7 scores, but order hands in the same way.
+    '''
+    popcount, top, straight = rank_tables()
+    held, paired, tripled, quads = counts
+    trips = tripled & ~quads
+    pairs = paired & ~tripled
+    singles = held & ~paired
+    flush = np.zeros_like(held)
+    for suit in range(4):
+        suit_mask = (suits >> (RANK_BITS * suit)) & RANK_MASK
+        flush = np.where(popcount[suit_mask] >= 5, suit_mask, flush)
+    straight_flush = straight[flush]
+    best_trips = top[1][trips]
+    best_pairs = top[2][pairs]
+    conditions = [
+        straight_flush > 0,
+        quads > 0,
+        (trips > 0) & ((pairs > 0) | (popcount[trips] >= 2)),
+        flush > 0,
+        straight[held] > 0,
+        trips > 0,
+        popcount[pairs] >= 2,
+        pairs > 0,
+    ]
+    # the category, then the ranks which decide the category, then the kickers
+    scores = [
+        (8 << 26) | (straight_flush << 13),
+        (7 << 26) | (quads << 13) | top[1][held & ~quads],
+        (6 << 26) | (best_trips << 13) | top[1][(trips & ~best_trips) | pairs],
+        (5 << 26) | (top[5][flush] << 13),
+        (4 << 26) | (straight[held] << 13),
+        (3 << 26) | (trips << 13) | top[2][singles],
+        (2 << 26) | (best_pairs << 13) | top[1][held & ~best_pairs],
+        (1 << 26) | (pairs << 13) | top[3][singles],
+    ]
+    return np.select(conditions, scores, top[5][singles])
+
+
+@lru_cache(maxsize=None)
+def rank_sum_table():
+    '''
+    Returns the score of every seven card hand without a flush, indexed by the sum of RANK_KEYS
+    over its cards. The keys are chosen so that every multiset of seven ranks has its own sum.
+    '''
+    multisets = np.array([ranks for ranks in itertools.combinations_with_replacement(range(13), 7)
+                          if max(map(ranks.count, ranks)) <= 4], dtype=np.int64)
+    counts = [np.zeros(len(multisets), dtype=np.int64) for _ in range(4)]
+    suits = np.zeros(len(multisets), dtype=np.int64)
+    for column in range(7):
+        # cycling through the suits never puts five cards in one suit
+        add_cards(counts, suits, multisets[:, column], column % 4)
+    table = np.zeros(4 * RANK_KEYS[-1] + 3 * RANK_KEYS[-2] + 1, dtype=np.int32)
+    table[np.array(RANK_KEYS)[multisets].sum(axis=1)] = score_hands(counts, suits)
+    return table
+
+
+def outcome_codes(hands, board, deck, runouts, bounty_ranks):
+    '''
+    Evaluates runouts, given as one row of deck indices per runout card, and returns the outcome
+    code of each: the winner (0, 1 or 2 for a split) times 4 plus the bounty hits as two bits.
+    Also returns the codes the runouts would have if flushes did not count.
+
+    Each card is packed into one integer holding its rank key, a count for its suit and a count
+    for each bounty it matches, so that summing the packed cards of a runout counts everything
+    needed about the runout in one pass. Flushes are only scored for the runouts which have one.
+    '''
+    popcount, top, straight = rank_tables()
+    table = rank_sum_table()
+    pack = lambda card: (RANK_KEYS[card.rank] | 1 << (SUIT_SHIFT + 3 * card.suit) |
+                         (card.rank == bounty_ranks[0]) << BOUNTY_SHIFT | (card.rank == bounty_ranks[1]) << (BOUNTY_SHIFT + 3))
+    suit_bits = lambda card: 1 << (RANK_BITS * card.suit + card.rank)
+    packed_deck = np.array([pack(card) for card in deck], dtype=np.int64)
+    suit_bits_deck = np.array([suit_bits(card) for card in deck], dtype=np.int64)
+    packed = np.full(runouts.shape[1], sum(map(pack, board)), dtype=np.int64)
+    # the rank mask of each suit, side by side
+    suit_masks = np.full(runouts.shape[1], sum(map(suit_bits, board)), dtype=np.int64)
+    for cards in runouts:
+        packed += packed_deck[cards]
+        suit_masks += suit_bits_deck[cards]
+    board_keys = packed & ((1 << SUIT_SHIFT) - 1)
+    scores = []
+    rank_scores = []
+    for hand in hands:
+        rank_scores.append(table[board_keys + sum(RANK_KEYS[card.rank] for card in hand)])
+        score = rank_scores[-1].copy()
+        for suit in range(4):
+            hand_bits = sum(1 << card.rank for card in hand if card.suit == suit)
+            needed = int(5 - popcount[hand_bits])
+            flush_runouts = np.nonzero(packed & (7 << (SUIT_SHIFT + 3 * suit)) >= needed << (SUIT_SHIFT + 3 * suit))[0]
+            if len(flush_runouts) == 0:
+                continue
+            suit_mask = ((suit_masks[flush_runouts] >> (RANK_BITS * suit)) & RANK_MASK) | hand_bits
+            flush_score = np.where(straight[suit_mask] > 0, (8 << 26) | (straight[suit_mask] << 13),
+                                   (5 << 26) | (top[5][suit_mask] << 13))
+            score[flush_runouts] = np.maximum(score[flush_runouts], flush_score)
+        scores.append(score)
+    hit_codes = np.zeros(runouts.shape[1], dtype=np.int8)
+    for player in range(2):
+        if any(card.rank == bounty_ranks[player] for card in hands[player]):
+            hit_codes += np.int8(2 - player)
+        else:
+            hit_codes += (packed & (7 << (BOUNTY_SHIFT + 3 * player)) != 0).view(np.int8) * np.int8(2 - player)
+    return tuple(hit_codes + (first < second).view(np.int8) * np.int8(4) + (first == second).view(np.int8) * np.int8(8)
+                 for first, second in (scores, rank_scores))
+
+
+@lru_cache(maxsize=None)
+def rank_multisets():
+    '''
+    Returns every multiset of five ranks, as the sum of their RANK_KEYS and the count of each rank.
+    '''
+    multisets = list(itertools.combinations_with_replacement(range(13), 5))
+    rank_counts = np.array([[ranks.count(rank) for rank in range(13)] for ranks in multisets], dtype=np.int64)
+    return rank_counts @ np.array(RANK_KEYS, dtype=np.int64), rank_counts
+
+
+def count_codes(codes, weights=None):
+    '''
+    Counts outcome codes, optionally weighted, by (winner, (bounty hit 0, bounty hit 1)).
+    '''
+    counts = np.bincount(codes.astype(np.intp), weights, minlength=12)
+    return {(code // 4, (bool(code & 2), bool(code & 1))): int(round(count)) for code, count in enumerate(counts)}
+
+
+def preflop_outcomes(hands, deck, bounty_ranks):
+    '''
+    Counts the outcomes of every five card board without enumerating most of them.
+
+    Without a flush, a board's outcome depends only on its ranks, so each multiset of five ranks
+    is scored once and weighted by the number of boards with those ranks. That is wrong only for
+    boards on which a player can make a flush, which need three or more cards of one suit and so
+    are few. Those are enumerated suit by suit, and their outcome with flushes replaces the outcome
+    their ranks alone gave. Two suits can never both have three cards on one board.
+    '''
+    popcount, top, straight = rank_tables()
+    table = rank_sum_table()
+    keys, rank_counts = rank_multisets()
+    held = np.zeros(13, dtype=np.int64)
+    for card in hands[0] + hands[1]:
+        held[card.rank] += 1
+    # the number of ways to pick each rank's cards from those of the rank left in the deck
+    choices = np.array([[math.comb(4 - held[rank], count) for count in range(6)] for rank in range(13)])
+    weights = np.prod(choices[np.arange(13), rank_counts], axis=1)
+    possible = weights > 0
+    keys, rank_counts, weights = keys[possible], rank_counts[possible], weights[possible]
+    codes = np.zeros(len(keys), dtype=np.int64)
+    scores = [table[keys + sum(RANK_KEYS[card.rank] for card in hand)] for hand in hands]
+    codes += 4 * (scores[0] < scores[1]) + 8 * (scores[0] == scores[1])
+    for player in range(2):
+        if any(card.rank == bounty_ranks[player] for card in hands[player]):
+            codes += 2 - player
+        elif bounty_ranks[player] >= 0:
+            codes += (2 - player) * (rank_counts[:, bounty_ranks[player]] > 0)
+    outcomes = count_codes(codes, weights)
+    for suit in range(4):
+        needed = 5 - max(sum(card.suit == suit for card in hand) for hand in hands)
+        suited = np.array([index for index, card in enumerate(deck) if card.suit == suit], dtype=np.int8)
+        others = np.array([index for index, card in enumerate(deck) if card.suit != suit], dtype=np.int8)
+        for num_suited in range(needed, 6):
+            suited_cards = suited[combinations_array(len(suited), num_suited)]
+            other_cards = others[combinations_array(len(others), 5 - num_suited)]
+            runouts = np.concatenate([np.repeat(suited_cards, other_cards.shape[1], axis=1),
+                                      np.tile(other_cards, suited_cards.shape[1])])
+            with_flushes, without_flushes = map(count_codes, outcome_codes(hands, [], deck, runouts, bounty_ranks))
+            for outcome in outcomes:
+                outcomes[outcome] += with_flushes[outcome] - without_flushes[outcome]
+    return outcomes
+
+
+def runout_outcomes_numpy(hands, board, bounty_ranks):
+    '''
+    Counts the runouts by outcome, evaluating all of them at once after the flop.
+    '''
+    deck = remaining_cards(hands, board)
+    if not board:
+        outcomes = preflop_outcomes(hands, deck, bounty_ranks)
+    else:
+        runouts = combinations_array(len(deck), 5 - len(board))
+        outcomes = count_codes(outcome_codes(hands, board, deck, runouts, bounty_ranks)[0])
+    return {outcome: count for outcome, count in outcomes.items() if count}
+
+
+def runout_outcomes(hands, board, bounties):
+    '''
+    Counts every runout of the board by (winner, (bounty hit 0, bounty hit 1)).
+
+    Hands and board are lists of eval7 Cards and bounties are rank characters such as 'A'. The
+    winner is 0 or 1, or 2 for a split pot.
+    '''
+    bounty_ranks = [RANKS.index(bounty) if bounty in RANKS else -1 for bounty in bounties]
+    if np is None:
+        return runout_outcomes_python(hands, board, bounty_ranks)
+    return runout_outcomes_numpy(hands, board, bounty_ranks)
@@ -0,0 +1,78 @@
+'''
+Programmatic configuration of the engine.
+
+config.py holds the defaults. A GameConfig is a copy of them with any of the values overridden,
+and is handed to Game, Player and RoundState instead of them reading config.py's globals, so
+that differently configured matches can run side by side in one process or on a worker pool.
+'''
+import argparse
+import ast
+
+import config
+
+# the settings which change the game itself, in the order they are sent to the pokerbots
+GAME_PARAMETERS = ['NUM_ROUNDS', 'STARTING_STACK', 'BIG_BLIND', 'SMALL_BLIND',
+                   'ROUNDS_PER_BOUNTY', 'BOUNTY_RATIO', 'BOUNTY_CONSTANT']
+
+
+class GameConfig():
+    '''
+    Every setting of config.py as an attribute, with keyword arguments overriding the defaults.
+    '''
+
+    def __init__(self, **overrides):
+        for name in dir(config):
+            if name.isupper():
+                setattr(self, name, getattr(config, name))
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise TypeError('unknown setting ' + name)
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return 'GameConfig({})'.format(', '.join('{}={!r}'.format(name, value) for name, value in vars(self).items()))
+
+    def replace(self, **overrides):
+        '''
+        Returns a copy of this configuration with some settings overridden.
+        '''
+        return GameConfig(**dict(vars(self), **overrides))
+
+    def parameters_clause(self):
+        '''
+        Encodes the game parameters as the clause which tells the pokerbots what game they play.
+        '''
+        return 'S' + ','.join(str(getattr(self, name)) for name in GAME_PARAMETERS)
+
+
+def parse_override(text):
+    '''
+    Parses a NAME=VALUE setting override. Values are Python literals, or else plain strings.
+    '''
+    name, _, value = text.partition('=')
+    name = name.strip().upper()
+    default = getattr(config, name, None)
+    if not name.isupper() or not hasattr(config, name):
+        raise argparse.ArgumentTypeError('unknown setting ' + name)
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    if isinstance(default, float) and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    return name, value
+
+
+def add_config_arguments(parser):
+    '''
+    Adds the --set option, which overrides config.py settings from the command line.
+    '''
+    parser.add_argument('--set', action='append', default=[], type=parse_override, metavar='NAME=VALUE',
+                        help='Override a config.py setting, e.g. --set BOUNTY_RATIO=2.0, repeatable')
+
+
+def config_from_args(args):
+    '''
+    Returns the GameConfig described by parsed command line arguments.
+    '''
+    return GameConfig(**dict(args.set))
@@ -0,0 +1,127 @@
+'''
+Structured hand history written by the engine alongside the text game log.
+
+The file is JSON Lines: a header record, one record per round, and an index record mapping each
+round number to the byte offset of its record. It ends with a fixed-width trailer record holding
+the offset of the index, so a reader can jump straight to any round without scanning the file.
+
+Round records have the fields:
+    round        the round number
+    players      the player names in seat order (seat 0 posts the small blind)
+    hands        the hole cards of each seat
+    board        the community cards dealt before the round ended
+    bounties     the bounty rank of each seat
+    actions      [street, seat, code, amount] per action, where code is F, C, K or R and
+                 amount is the raise-to amount of an R and 0 otherwise
+    deltas       the bankroll change of each seat
+    bounty_hits  whether each seat hit its bounty
+    showdown     whether the round ended at showdown
+
+Rounds in which both players were all-in before the river may also have:
+    all_in_deltas  the expected bankroll change of each seat over every runout of the board
+'''
+import json
+import os
+
+FORMAT_NAME = 'pokerbots-hand-history'
+FORMAT_VERSION = 1
+TRAILER_FORMAT = '{{"index_offset": {:>20}}}\n'
+TRAILER_SIZE = len(TRAILER_FORMAT.format(0))
+ACTION_CODES = {'FoldAction': 'F', 'CallAction': 'C', 'CheckAction': 'K', 'RaiseAction': 'R'}
+
+
+class HandHistoryWriter():
+    '''
+    Streams round records to disk and writes the round index when closed.
+
+    Given the result of checkpoint(), the writer continues an existing file from that point.
+    '''
+
+    def __init__(self, filename, players, seed, checkpoint=None):
+        self.filename = filename
+        if checkpoint is None:
+            self.history_file = open(filename, 'wb')
+            self.offsets = {}
+            self.write_record({'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'players': players, 'seed': seed})
+        else:
+            self.history_file = open(filename, 'r+b')
+            self.history_file.truncate(checkpoint['offset'])
+            self.history_file.seek(checkpoint['offset'])
+            self.offsets = {int(round_num): offset for round_num, offset in checkpoint['index'].items()}
+
+    def checkpoint(self):
+        '''
+        Returns where the file ends and the offsets of the rounds written so far.
+        '''
+        return {'offset': self.history_file.tell(), 'index': self.offsets}
+
+    def write_record(self, record):
+        '''
+        Appends one record as a line of compact JSON and returns its byte offset.
+        '''
+        offset = self.history_file.tell()
+        self.history_file.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        return offset
+
+    def write_round(self, round_num, players, hands, board, bounties, actions, deltas, bounty_hits, all_in_deltas=None):
+        '''
+        Records one finished round. Actions are (street, seat, action) triples.
+        '''
+        record = {
+            'round': round_num,
+            'players': players,
+            'hands': [list(map(str, hand)) for hand in hands],
+            'board': list(map(str, board)),
+            'bounties': list(bounties),
+            'actions': [[street, seat, ACTION_CODES[type(action).__name__], getattr(action, 'amount', 0)]
+                        for street, seat, action in actions],
+            'deltas': list(deltas),
+            'bounty_hits': list(bounty_hits),
+            'showdown': ACTION_CODES[type(actions[-1][2]).__name__] != 'F',
+        }
+        if all_in_deltas is not None:
+            record['all_in_deltas'] = [round(delta, 4) for delta in all_in_deltas]
+        self.offsets[round_num] = self.write_record(record)
+        self.history_file.flush()
+
+    def close(self):
+        '''
+        Writes the round index and the trailer pointing at it.
+        '''
+        index_offset = self.write_record({'index': {str(round_num): offset for round_num, offset in self.offsets.items()}})
+        self.history_file.write(TRAILER_FORMAT.format(index_offset).encode())
+        self.history_file.close()
+
+
+def read_index(filename):
+    '''
+    Returns a dictionary from round number to the byte offset of the round's record.
+    '''
+    with open(filename, 'rb') as history_file:
+        history_file.seek(-TRAILER_SIZE, os.SEEK_END)
+        index_offset = json.loads(history_file.read())['index_offset']
+        history_file.seek(index_offset)
+        index = json.loads(history_file.readline())['index']
+    return {int(round_num): offset for round_num, offset in index.items()}
+
+
+def read_round(filename, round_num, index=None):
+    '''
+    Returns the record of one round, reading only the index and that record.
+    '''
+    if index is None:
+        index = read_index(filename)
+    with open(filename, 'rb') as history_file:
+        history_file.seek(index[round_num])
+        return json.loads(history_file.readline())
+
+
+def read_rounds(filename):
+    '''
+    Generator over every round record in the file, in the order the rounds were played.
+    '''
+    with open(filename, 'rb') as history_file:
+        for line in history_file:
+            record = json.loads(line)
+            if 'round' in record:
+                yield record
@@ -22,6 +22,13 @@ public interface Bot {
      */
     public void handleRoundOver(GameState gameState, TerminalState terminalState, int active);
 
+    /**
+     * Called when the engine keeps the pokerbot running for another match, before its first round.
+     * Resets whatever the pokerbot remembers between rounds; does nothing by default.
+     */
+    public default void handleNewMatch() {
+    }
+
     /**
      * Where the magic happens - your code should implement this function.
      * Called any time the engine needs an action from your bot.
@@ -71,6 +71,7 @@ public class Runner {
         boolean roundFlag = true;
         while (true) {
             String[] packet = this.receive();
+            boolean newMatch = false;
             for (String clause : packet) {
                 String leftover = clause.substring(1, clause.length());
                 switch (clause.charAt(0)) {
@@ -175,6 +176,15 @@ public class Runner {
                         roundFlag = true;
                         break;
                     }
+                    case 'N': {
+                        // the engine kept this pokerbot running for another match
+                        gameState = new GameState(0, (float)0., 1);
+                        active = 0;
+                        roundFlag = true;
+                        this.pokerbot.handleNewMatch();
+                        newMatch = true;
+                        break;
+                    }
                     case 'Q': {
                         return;
                     }
@@ -183,7 +193,9 @@ public class Runner {
                     }
                 }
             }
-            if (roundFlag) {  // ack the engine
+            if (newMatch) {  // confirm the reset, which a plain ack would not
+                this.outStream.println("N");
+            } else if (roundFlag) {  // ack the engine
                 this.send(new Action(ActionType.CHECK_ACTION_TYPE));
             } else {
                 Action action = this.pokerbot.getAction(gameState, (RoundState)roundState, active);
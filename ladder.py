@@ -0,0 +1,297 @@
+'''
+A persistent rating ladder for pokerbot versions, which schedules the matches it learns most from.
+
+Every pokerbot has a Gaussian skill rating, updated after each match with the two-player
+TrueSkill rule from the sign of the match's all-in adjusted bankroll. Rather than playing every
+pairing, the ladder repeatedly picks the pairing whose result is expected to shrink the rating
+variances the most, which favours uncertain pokerbots and closely matched pairs, and plays it on a
+pool of worker processes.
+
+The ladder file stores the match results, not the ratings, which are replayed from the results
+when the ladder is loaded. Each pokerbot version is identified by its name and the hash of its
+code, so a changed pokerbot starts a new rating while its old results still rate its opponents.
+Given no pokerbots, the ladder rates the pokerbot generations kept in this repository.
+'''
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import itertools
+import argparse
+import ast
+import hashlib
+import json
+import math
+import os
+
+from engine import bot_location
+from game_config import add_config_arguments, config_from_args
+from tournament import bot_names, build_bots, play_match
+
+# the TrueSkill defaults: the prior rating, the performance noise of one match and the skill drift
+INITIAL_MU = 25.
+INITIAL_SIGMA = INITIAL_MU / 3
+BETA = INITIAL_SIGMA / 2
+TAU = INITIAL_SIGMA / 100
+# the pokerbot generations kept in this repository, which the ladder rates when given no paths
+REGISTERED_BOTS = ['./bot/week1.py', './bot/jan24.py', './bot/player.py',
+                   './python_skeleton/previous_bot_version.py', './python_skeleton/pot_odds_bot.py']
+
+
+def normal_pdf(x):
+    '''
+    The standard normal density.
+    '''
+    return math.exp(-x * x / 2) / math.sqrt(2 * math.pi)
+
+
+def normal_cdf(x):
+    '''
+    The standard normal distribution function.
+    '''
+    return (1 + math.erf(x / math.sqrt(2))) / 2
+
+
+def imported_modules(filename):
+    '''
+    Returns the top level modules a Python script imports, by module name.
+    '''
+    with open(filename, 'rb') as script_file:
+        tree = ast.parse(script_file.read(), filename)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.partition('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module.partition('.')[0])
+    return modules
+
+
+def bot_version(path):
+    '''
+    Returns a hash of the pokerbot's code, which is its whole directory. For a script path, the
+    directory's other top level scripts are left out unless the script imports them, since they are
+    the other pokerbot versions kept beside it, while its skeleton and other files are kept in.
+    '''
+    directory, script = bot_location(path)
+    digest = hashlib.sha256()
+    skipped = set()
+    if script is not None:
+        modules = imported_modules(os.path.join(directory, script))
+        skipped = {filename for filename in os.listdir(directory) if filename.endswith('.py')
+                   and filename != script and filename[:-len('.py')] not in modules}
+    filenames = sorted(os.path.join(root, filename) for root, dirs, files in os.walk(directory)
+                       for filename in files if not filename.endswith(('.pyc', '.txt'))
+                       and not (root == directory and filename in skipped))
+    for filename in filenames:
+        digest.update(os.path.relpath(filename, directory).encode() + b'\0')
+        with open(filename, 'rb') as code_file:
+            digest.update(code_file.read())
+    return digest.hexdigest()[:12]
+
+
+class Rating():
+    '''
+    A Gaussian belief about one pokerbot version's skill.
+    '''
+
+    def __init__(self, mu=INITIAL_MU, sigma=INITIAL_SIGMA):
+        self.mu = mu
+        self.sigma = sigma
+        self.matches = 0
+
+    def conservative(self):
+        '''
+        Returns the skill the pokerbot very probably exceeds, used to order the ladder.
+        '''
+        return self.mu - 3 * self.sigma
+
+
+def match_terms(rating_a, rating_b):
+    '''
+    Returns the total variance of a match's performance difference and A's probability of winning.
+    '''
+    variance = 2 * BETA ** 2 + rating_a.sigma ** 2 + rating_b.sigma ** 2
+    return variance, normal_cdf((rating_a.mu - rating_b.mu) / math.sqrt(variance))
+
+
+def truncation_terms(t):
+    '''
+    Returns the mean and variance corrections of TrueSkill's win update at normalized margin t.
+    '''
+    v = normal_pdf(t) / max(normal_cdf(t), 1e-300)
+    return v, v * (v + t)
+
+
+def update(winner, loser):
+    '''
+    Updates two ratings in place after the first one won a match.
+    '''
+    for rating in (winner, loser):
+        rating.sigma = math.sqrt(rating.sigma ** 2 + TAU ** 2)
+        rating.matches += 1
+    variance = 2 * BETA ** 2 + winner.sigma ** 2 + loser.sigma ** 2
+    c = math.sqrt(variance)
+    v, w = truncation_terms((winner.mu - loser.mu) / c)
+    for rating, sign in ((winner, 1), (loser, -1)):
+        rating.mu += sign * rating.sigma ** 2 / c * v
+        rating.sigma = math.sqrt(rating.sigma ** 2 * max(1 - rating.sigma ** 2 / variance * w, 1e-6))
+
+
+def information_gain(rating_a, rating_b):
+    '''
+    Returns the expected reduction of the two rating variances from one match between them.
+    '''
+    variance, win_probability = match_terms(rating_a, rating_b)
+    t = (rating_a.mu - rating_b.mu) / math.sqrt(variance)
+    expected_w = win_probability * truncation_terms(t)[1] + (1 - win_probability) * truncation_terms(-t)[1]
+    return (rating_a.sigma ** 4 + rating_b.sigma ** 4) / variance * expected_w
+
+
+class Ladder():
+    '''
+    The match results of every pokerbot version ever entered, and the ratings they imply.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.results = []
+        if os.path.exists(filename):
+            with open(filename, 'r') as ladder_file:
+                self.results = json.load(ladder_file)['results']
+        self.ratings = {}
+        for result in self.results:
+            self.apply(result)
+
+    def rating(self, version):
+        '''
+        Returns the rating of a version, starting from the prior for a version never seen.
+        '''
+        return self.ratings.setdefault(version, Rating())
+
+    def apply(self, result):
+        '''
+        Updates the ratings with one match result. Tied matches leave the ratings unchanged.
+        '''
+        (version_a, version_b), (score_a, score_b) = result['versions'], result['adjusted']
+        if score_a > score_b:
+            update(self.rating(version_a), self.rating(version_b))
+        elif score_b > score_a:
+            update(self.rating(version_b), self.rating(version_a))
+
+    def record(self, result):
+        '''
+        Adds one match result and saves the ladder, replacing the file atomically.
+        '''
+        self.results.append(result)
+        self.apply(result)
+        temporary_filename = self.filename + '.tmp'
+        with open(temporary_filename, 'w') as ladder_file:
+            json.dump({'results': self.results}, ladder_file, indent=1)
+        os.replace(temporary_filename, self.filename)
+
+    def meetings(self, version_a, version_b):
+        '''
+        Returns how many matches the two versions have played against each other.
+        '''
+        return sum(1 for result in self.results if set(result['versions']) == {version_a, version_b})
+
+    def next_pairing(self, versions, busy=()):
+        '''
+        Returns the pair of versions whose next match is expected to be most informative, skipping
+        pairs which are already playing unless every pair is. Seats alternate between meetings.
+        '''
+        pairings = [pairing for pairing in itertools.combinations(versions, 2) if frozenset(pairing) not in busy]
+        if not pairings:
+            pairings = list(itertools.combinations(versions, 2))
+        version_a, version_b = max(pairings, key=lambda pairing: information_gain(*map(self.rating, pairing)))
+        if self.meetings(version_a, version_b) % 2 == 1:
+            return version_b, version_a
+        return version_a, version_b
+
+    def standings(self, versions):
+        '''
+        Returns one row per given version, ordered by conservative skill estimate.
+        '''
+        ordered = sorted(versions, key=lambda version: self.rating(version).conservative(), reverse=True)
+        return [{'name': versions[version], 'version': version, 'mu': self.rating(version).mu,
+                 'sigma': self.rating(version).sigma, 'matches': self.rating(version).matches}
+                for version in ordered]
+
+
+def run_ladder(paths, num_matches, ladder_file='ladder.json', workers=None, output_dir='ladder',
+               in_process=False, duplicate=False, warm=False, early_stopping=False, config=None):
+    '''
+    Plays num_matches adaptively chosen matches between the pokerbots on a pool of at most
+    `workers` processes, recording each result as it finishes, and returns the standings.
+    '''
+    names = bot_names(paths)
+    versions = {'{}@{}'.format(name, bot_version(path)): name for name, path in zip(names, paths)}
+    paths_by_version = dict(zip(versions, paths))
+    ladder = Ladder(ladder_file)
+    os.makedirs(output_dir, exist_ok=True)
+    build_dir = os.path.join(output_dir, 'builds')
+    os.makedirs(build_dir, exist_ok=True)
+    build_bots(names, paths, build_dir, config)
+    if len(versions) < 2:
+        return ladder.standings(versions)
+    workers = workers or os.cpu_count()
+    first_match = len(ladder.results) + 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        for match_num in range(first_match, first_match + num_matches):
+            if len(running) == workers:
+                record_finished(ladder, running, wait(running, return_when=FIRST_COMPLETED).done)
+            pairing = ladder.next_pairing(list(versions), {frozenset(pairing) for pairing, _ in running.values()})
+            match_names = [versions[version] for version in pairing]
+            match_dir = os.path.join(output_dir, 'match_{:04d}_{}_vs_{}'.format(match_num, *match_names))
+            future = executor.submit(play_match, match_dir, match_names, [paths_by_version[version] for version in pairing],
+                                     in_process, duplicate, warm, early_stopping, config)
+            running[future] = pairing, match_names
+        record_finished(ladder, running, list(running))
+    return ladder.standings(versions)
+
+
+def record_finished(ladder, running, futures):
+    '''
+    Records the results of finished matches in the ladder and forgets them.
+    '''
+    for future in futures:
+        pairing, names = running.pop(future)
+        bankrolls, adjusted = future.result()
+        ladder.record({'versions': list(pairing), 'bankrolls': [bankrolls[name] for name in names],
+                       'adjusted': [round(adjusted[name], 2) for name in names]})
+        print(' vs '.join(pairing), bankrolls)
+
+
+def print_standings(table):
+    '''
+    Prints the ladder as a fixed-width table.
+    '''
+    print('{:<24}{:>14}{:>8}{:>8}{:>8}'.format('Bot', 'Version', 'Mu', 'Sigma', 'Matches'))
+    for row in table:
+        print('{name:<24}{:>14}{mu:>8.2f}{sigma:>8.2f}{matches:>8}'.format(row['version'].rpartition('@')[2], **row))
+
+
+def parse_args():
+    '''
+    Parses the ladder's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 ladder.py')
+    parser.add_argument('paths', nargs='*', default=REGISTERED_BOTS,
+                        help='Pokerbot directories, each containing a commands.json, or Python scripts inside them, '
+                             'defaulting to the pokerbot generations kept in this repository')
+    parser.add_argument('--matches', type=int, default=10, help='Matches to play before printing the ladder')
+    parser.add_argument('--ladder-file', type=str, default='ladder.json', help='File keeping every match result')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent matches, defaults to the number of cores')
+    parser.add_argument('--output-dir', type=str, default='ladder', help='Directory for per-match output')
+    parser.add_argument('--in-process', action='store_true', help='Run Python bots inside the match processes')
+    parser.add_argument('--duplicate', action='store_true', help='Play every deal twice with the seats swapped')
+    parser.add_argument('--warm', action='store_true', help='Keep pokerbots running between the matches of a worker')
+    parser.add_argument('--early-stop', action='store_true',
+                        help='End each match once a sequential test decides it, instead of playing every round')
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print_standings(run_ladder(args.paths, args.matches, args.ladder_file, args.workers, args.output_dir,
+                               args.in_process, args.duplicate, args.warm, args.early_stop, config_from_args(args)))
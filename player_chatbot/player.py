@@ -6,10 +6,6 @@ from skeleton.actions import CallAction, CheckAction, FoldAction, RaiseAction
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
 from skeleton.states import (
-    BIG_BLIND,
-    NUM_ROUNDS,
-    SMALL_BLIND,
-    STARTING_STACK,
     GameState,
     RoundState,
     TerminalState,
@@ -216,10 +212,10 @@ class Player(Bot):
             opp_pip - my_pip
         )  # the number of chips needed to stay in the pot
         my_contribution = (
-            STARTING_STACK - my_stack
+            game_state.parameters.starting_stack - my_stack
         )  # the number of chips you have contributed to the pot
         opp_contribution = (
-            STARTING_STACK - opp_stack
+            game_state.parameters.starting_stack - opp_stack
         )  # the number of chips your opponent has contributed to the pot
 
         print()
@@ -8,6 +8,47 @@ class Bot():
     The base class for a pokerbot.
     '''
 
+    def handle_new_match(self):
+        '''
+        Called when the engine reuses your running bot for another match, before its first round.
+        The default reinitializes your bot from scratch; override it to keep anything expensive
+        to build, such as precomputed tables, and reset only your per-match state.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.__init__()
+
+    def save_state(self):
+        '''
+        Called when the engine checkpoints the match between rounds, so that an interrupted match
+        can resume where it left off. Return whatever your bot learns during a match and would
+        want back, such as an opponent model. The default saves nothing.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Any picklable object, or None.
+        '''
+        return None
+
+    def restore_state(self, state):
+        '''
+        Called when the engine resumes a match from a checkpoint, before the first round played
+        after it. The default does nothing.
+
+        Arguments:
+        state: what save_state returned when the checkpoint was written.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
     def handle_new_round(self, game_state, round_state, active):
         '''
         Called when a new round starts. Called NUM_ROUNDS times.
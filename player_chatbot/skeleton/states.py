@@ -3,21 +3,34 @@ Encapsulates game and round state information for the player.
 '''
 from collections import namedtuple
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction
+from .round_core import RoundCore, Rules, action_sets, encode_card, encode_rank, legal_mask, raise_bounds
 
-GameState = namedtuple('GameState', ['bankroll', 'game_clock', 'round_num'])
-TerminalState = namedtuple('TerminalState', ['deltas', 'bounty_hits', 'previous_state'])
-
+# the defaults, which the engine overrides at the start of every match
 NUM_ROUNDS = 1000
 STARTING_STACK = 400
 BIG_BLIND = 2
 SMALL_BLIND = 1
+ROUNDS_PER_BOUNTY = 25
+BOUNTY_RATIO = 1.5
+BOUNTY_CONSTANT = 10
 
+GameParameters = namedtuple('GameParameters', ['num_rounds', 'starting_stack', 'big_blind', 'small_blind',
+                                               'rounds_per_bounty', 'bounty_ratio', 'bounty_constant'])
+DEFAULT_PARAMETERS = GameParameters(NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND,
+                                    ROUNDS_PER_BOUNTY, BOUNTY_RATIO, BOUNTY_CONSTANT)
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'bounties', 'deck', 'previous_state'])):
+LEGAL_ACTIONS = action_sets(FoldAction, CallAction, CheckAction, RaiseAction)
+
+GameState = namedtuple('GameState', ['bankroll', 'game_clock', 'round_num', 'parameters'], defaults=[DEFAULT_PARAMETERS])
+TerminalState = namedtuple('TerminalState', ['deltas', 'bounty_hits', 'previous_state'])
+
+
+class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks', 'hands', 'bounties', 'deck', 'previous_state', 'parameters'],
+                            defaults=[DEFAULT_PARAMETERS])):
     '''
-    Encodes the game tree for one round of poker.
+    Encodes the game tree for one round of poker, under the stacks and blinds of its game parameters.
     '''
-    
+
     def get_bounty_hits(self):
         '''
         Determines if each player hit their bounty card during the round.
@@ -44,28 +57,32 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
 
     def legal_actions(self):
         '''
-        Returns a set which corresponds to the active player's legal moves.
+        Returns a frozenset which corresponds to the active player's legal moves.
         '''
-        active = self.button % 2
-        continue_cost = self.pips[1-active] - self.pips[active]
-        if continue_cost == 0:
-            # we can only raise the stakes if both players can afford it
-            bets_forbidden = (self.stacks[0] == 0 or self.stacks[1] == 0)
-            return {CheckAction, FoldAction} if bets_forbidden else {CheckAction, RaiseAction, FoldAction}
-        # continue_cost > 0
-        # similarly, re-raising is only allowed if both players can afford it
-        raises_forbidden = (continue_cost == self.stacks[active] or self.stacks[1-active] == 0)
-        return {FoldAction, CallAction} if raises_forbidden else {FoldAction, CallAction, RaiseAction}
+        return LEGAL_ACTIONS[legal_mask(self.button, self.pips, self.stacks)]
 
     def raise_bounds(self):
         '''
         Returns a tuple of the minimum and maximum legal raises.
         '''
-        active = self.button % 2
-        continue_cost = self.pips[1-active] - self.pips[active]
-        max_contribution = min(self.stacks[active], self.stacks[1-active] + continue_cost)
-        min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
-        return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
+        return raise_bounds(self.button, self.pips, self.stacks, self.parameters.big_blind)
+
+    def core(self, hands=None, board=None, bounties=None):
+        '''
+        Returns the round as a RoundCore, for fast simulation of its continuations.
+
+        The opponent's hand, the undealt board cards and the opponent's bounty are unknown, so
+        simulations pass in guesses: hands must hold 2 cards each and board 5 cards. Without a
+        guess, the opponent's bounty is never hit.
+        '''
+        parameters = self.parameters
+        rules = Rules(parameters.starting_stack, parameters.small_blind, parameters.big_blind,
+                      parameters.bounty_ratio, parameters.bounty_constant)
+        hands = self.hands if hands is None else hands
+        board = self.deck if board is None else board
+        cards = [encode_card(card) for card in list(hands[0]) + list(hands[1]) + list(board)]
+        bounties = [encode_rank(bounty) for bounty in (self.bounties if bounties is None else bounties)]
+        return RoundCore(cards, bounties, rules, self.button, self.street, self.pips, self.stacks)
 
     def proceed_street(self):
         '''
@@ -74,7 +91,7 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         if self.street == 5:
             return self.showdown()
         new_street = 3 if self.street == 0 else self.street + 1
-        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.bounties, self.deck, self)
+        return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.bounties, self.deck, self, self.parameters)
 
     def proceed(self, action):
         '''
@@ -82,28 +99,31 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         '''
         active = self.button % 2
         if isinstance(action, FoldAction):
-            delta = self.stacks[0] - STARTING_STACK if active == 0 else STARTING_STACK - self.stacks[1]
+            starting_stack = self.parameters.starting_stack
+            delta = self.stacks[0] - starting_stack if active == 0 else starting_stack - self.stacks[1]
             return TerminalState([delta, -delta], self.get_bounty_hits(), self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb
-                return RoundState(1, 0, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.bounties, self.deck, self)
+                big_blind = self.parameters.big_blind
+                return RoundState(1, 0, [big_blind] * 2, [self.parameters.starting_stack - big_blind] * 2,
+                                  self.hands, self.bounties, self.deck, self, self.parameters)
             # both players acted
             new_pips = list(self.pips)
             new_stacks = list(self.stacks)
             contribution = new_pips[1-active] - new_pips[active]
             new_stacks[active] -= contribution
             new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self)
+            state = RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self, self.parameters)
             return state.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.bounties, self.deck, self)
+            return RoundState(self.button + 1, self.street, self.pips, self.stacks, self.hands, self.bounties, self.deck, self, self.parameters)
         # isinstance(action, RaiseAction)
         new_pips = list(self.pips)
         new_stacks = list(self.stacks)
         contribution = action.amount - new_pips[active]
         new_stacks[active] -= contribution
         new_pips[active] += contribution
-        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self)
+        return RoundState(self.button + 1, self.street, new_pips, new_stacks, self.hands, self.bounties, self.deck, self, self.parameters)
@@ -0,0 +1,393 @@
+'''
+A reinforcement learning environment in which a learned policy plays matches against an existing
+pokerbot, run in-process.
+
+Each PokerEnv is one seat of a series of matches driven by the engine's own Game: cards, bounty
+blocks, seat changes, the game clock and the messages the opponent receives are exactly those of
+a real match, and the opponent is an unmodified pokerbot attached through its skeleton's Runner,
+as with IN_PROCESS_BOTS. An episode is one round, from the learner's first decision to the end
+of the round, and its reward is the learner's delta. Rounds in which the learner never acts,
+such as when its opponent folds the small blind, are played through and skipped.
+
+Observations are float32 vectors of OBSERVATION_SIZE: the learner's hand and the board one-hot
+over the 52 cards, the street one-hot, the learner's and the opponent's pips and stacks as
+fractions of the starting stack, the learner's bounty rank one-hot and whether it is the big
+blind. The actions are the indices of ACTIONS, and the mask of the legal ones is returned with
+every observation; a raise when raising is not allowed checks or calls instead.
+
+VectorEnv steps many PokerEnvs in one process, and PoolVectorEnv spreads VectorEnvs over worker
+processes. Both reset finished environments to their next round automatically.
+'''
+import multiprocessing
+import contextlib
+import argparse
+import tempfile
+import random
+import time
+import os
+
+import numpy as np
+
+import engine
+from engine import CallAction, CheckAction, FoldAction, RaiseAction, TerminalState
+from game_config import add_config_arguments, config_from_args
+from round_core import encode_card, encode_rank
+
+ACTIONS = ['fold', 'check/call', 'raise min', 'raise half pot', 'raise pot', 'all in']
+# the raise of each raising action as a fraction of the pot after calling, None for the bounds
+RAISE_FRACTIONS = [None, 0.5, 1., None]
+# the legal action mask when raising is or is not allowed
+RAISE_MASK = (1 << len(ACTIONS)) - 1
+CALL_MASK = 0b11
+OBSERVATION_SIZE = 52 + 52 + 4 + 4 + 13 + 1
+HAND, BOARD, STREET, CHIPS, BOUNTY, BIG_BLIND = 0, 52, 104, 108, 112, 125
+STREET_INDEX = {0: 0, 3: 1, 4: 2, 5: 3}
+# the opponent's output is only kept for debugging, so each one holds at most this many bytes of it
+OPPONENT_LOG_SIZE_LIMIT = 16384
+
+
+def env_config(config=None):
+    '''
+    Returns the config of a training match: nothing written to disk and nothing stopping it early.
+    '''
+    config = engine.DEFAULT_CONFIG if config is None else config
+    return config.replace(WRITE_GAME_LOG=False, WRITE_HAND_HISTORY=False, WRITE_LATENCY_STATS=False,
+                          EARLY_STOPPING=False, CHECKPOINT_ROUNDS=None, ALL_IN_EQUITY=False,
+                          PLAYER_LOG_SIZE_LIMIT=min(config.PLAYER_LOG_SIZE_LIMIT, OPPONENT_LOG_SIZE_LIMIT))
+
+
+def load_opponents(path, count, log_dir, config):
+    '''
+    Returns `count` in-process players of the pokerbot at path, each with its own instance of the
+    pokerbot, importing its code only once.
+    '''
+    template = engine.InProcessPlayer('opponent0', path, log_dir, config=config)
+    template.build()
+    if template.pokerbot is None:
+        raise ValueError('could not load {} in-process, see {}'.format(path, log_dir))
+    players = [template]
+    for index in range(1, count):
+        player = engine.InProcessPlayer('opponent{}'.format(index), path, log_dir, config=config)
+        player.directory = template.directory
+        # the pokerbot may read data files relative to its own directory while it initializes
+        with player.pokerbot_context():
+            player.pokerbot = type(template.pokerbot)()
+        player.runner_class = template.runner_class
+        players.append(player)
+    return players
+
+
+class PokerEnv():
+    '''
+    The learner's seat in an endless series of matches against one in-process pokerbot.
+    '''
+
+    def __init__(self, opponent, config=None, seed=None, log_dir='.'):
+        self.config = env_config(config)
+        self.opponent = opponent
+        self.learner = engine.Player('learner', None, log_dir, config=self.config)
+        self.log_dir = log_dir
+        self.rng = random.Random(seed)
+        self.game = None
+        self.round_num = 0
+        self.players = None
+        self.seat = 0
+        self.queries = None
+        self.round_state = None
+        self.reward = 0
+
+    @classmethod
+    def from_path(cls, opponent_path, config=None, seed=None, log_dir='.'):
+        '''
+        Returns an environment against the pokerbot at opponent_path.
+        '''
+        return cls(load_opponents(opponent_path, 1, log_dir, env_config(config))[0], config, seed, log_dir)
+
+    def start_match(self):
+        '''
+        Starts a new match with a new deal schedule, reusing the opponent already attached.
+        '''
+        for player in (self.learner, self.opponent):
+            player.start_match(player.name, self.log_dir, self.config)
+        # the engine's status messages about the opponent go to its log rather than the console
+        with contextlib.redirect_stdout(self.opponent.stdout):
+            self.opponent.run()
+        self.game = engine.Game([self.learner, self.opponent], self.log_dir, seed=self.rng.randrange(2 ** 32),
+                                config=self.config)
+        self.round_num = 0
+
+    def advance(self, action):
+        '''
+        Plays the round on from the learner's action, or from the start of the round for None,
+        until the learner must act again. Returns False once the round is over instead.
+        '''
+        game = self.game
+        while True:
+            try:
+                active, round_state = self.queries.send(action)
+            except StopIteration:
+                game.end_round(self.players, self.round_num)
+                return False
+            if active != self.seat:
+                action = self.players[active].query(round_state, game.player_messages[active], game.log)
+            elif isinstance(round_state, TerminalState):
+                self.reward = round_state.deltas[active]
+                action = None
+            else:
+                # nobody reads the learner's messages, so keep only its game clock clause
+                del game.player_messages[active][1:]
+                self.round_state = round_state
+                return True
+
+    def reset(self, observation=None):
+        '''
+        Starts the next round in which the learner acts, and returns its first observation and the
+        mask of its legal actions.
+        '''
+        while True:
+            if self.game is None or self.round_num == self.config.NUM_ROUNDS:
+                self.start_match()
+            self.round_num += 1
+            self.players, bounties, deck = self.game.start_round(self.round_num)
+            self.seat = self.players.index(self.learner)
+            self.queries = self.game.round_queries(self.players, bounties, deck, self.round_num)
+            if self.advance(None):
+                return self.observe(observation), self.legal_actions()
+
+    def step(self, action, observation=None):
+        '''
+        Performs the learner's action and returns the next observation, the reward, whether the
+        round is over and the mask of legal actions. The observation of a finished round is zero.
+        '''
+        self.reward = 0
+        if self.advance(self.engine_action(action)):
+            return self.observe(observation), 0, False, self.legal_actions()
+        if observation is None:
+            observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        else:
+            observation[:] = 0
+        return observation, self.reward, True, 0
+
+    def legal_actions(self):
+        '''
+        Returns the mask of the learner's legal actions, one bit per index of ACTIONS.
+        '''
+        return RAISE_MASK if RaiseAction in self.round_state.legal_actions() else CALL_MASK
+
+    def engine_action(self, index):
+        '''
+        Returns the engine action for an index of ACTIONS in the current state.
+        '''
+        round_state = self.round_state
+        legal_actions = round_state.legal_actions()
+        if index == 0:
+            return FoldAction()
+        if index == 1 or RaiseAction not in legal_actions:
+            return CheckAction() if CheckAction in legal_actions else CallAction()
+        min_raise, max_raise = round_state.raise_bounds()
+        fraction = RAISE_FRACTIONS[index - 2]
+        if fraction is None:
+            return RaiseAction(min_raise if index == 2 else max_raise)
+        active = self.seat
+        continue_cost = round_state.pips[1-active] - round_state.pips[active]
+        pot = 2 * self.config.STARTING_STACK - round_state.stacks[0] - round_state.stacks[1] + continue_cost
+        amount = round_state.pips[active] + continue_cost + int(fraction * pot)
+        return RaiseAction(min(max(amount, min_raise), max_raise))
+
+    def observe(self, observation=None):
+        '''
+        Encodes the learner's view of the current state, into the given array if there is one.
+        '''
+        if observation is None:
+            observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        else:
+            observation[:] = 0
+        round_state = self.round_state
+        active = self.seat
+        for card in round_state.hands[active]:
+            observation[HAND + encode_card(card)] = 1
+        if round_state.street > 0:
+            for card in round_state.deck.peek(round_state.street):
+                observation[BOARD + encode_card(card)] = 1
+        observation[STREET + STREET_INDEX[round_state.street]] = 1
+        starting_stack = self.config.STARTING_STACK
+        observation[CHIPS:CHIPS + 4] = [round_state.pips[active] / starting_stack, round_state.pips[1-active] / starting_stack,
+                                        round_state.stacks[active] / starting_stack, round_state.stacks[1-active] / starting_stack]
+        observation[BOUNTY + encode_rank(round_state.bounties[active])] = 1
+        observation[BIG_BLIND] = active
+        return observation
+
+    def close(self):
+        '''
+        Ends the opponent's last match and writes its log.
+        '''
+        self.opponent.terminate()
+        self.opponent.output.close()
+
+
+class VectorEnv():
+    '''
+    Many PokerEnvs against the same pokerbot, stepped together in one process.
+
+    Observations come as one row per environment. An environment whose round ends is reset at
+    once, so the observation returned for it is already that of its next round.
+    '''
+
+    def __init__(self, opponent_path, num_envs, config=None, seed=None, log_dir=None):
+        self.log_dir = tempfile.mkdtemp(prefix='pokerbots-env-') if log_dir is None else log_dir
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        opponents = load_opponents(opponent_path, num_envs, self.log_dir, env_config(config))
+        self.envs = [PokerEnv(opponent, config, seed + index, self.log_dir) for index, opponent in enumerate(opponents)]
+        self.observations = np.zeros((num_envs, OBSERVATION_SIZE), dtype=np.float32)
+        self.legal_actions = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self):
+        '''
+        Starts a round in every environment and returns the observations and legal action masks.
+        '''
+        for index, env in enumerate(self.envs):
+            _, self.legal_actions[index] = env.reset(self.observations[index])
+        return self.observations.copy(), self.legal_actions.copy()
+
+    def step(self, actions):
+        '''
+        Performs one action in every environment and returns the observations, rewards, whether
+        each round ended and the legal action masks.
+        '''
+        rewards = np.zeros(len(self.envs), dtype=np.float32)
+        dones = np.zeros(len(self.envs), dtype=bool)
+        for index, env in enumerate(self.envs):
+            _, rewards[index], dones[index], self.legal_actions[index] = env.step(actions[index], self.observations[index])
+            if dones[index]:
+                _, self.legal_actions[index] = env.reset(self.observations[index])
+        return self.observations.copy(), rewards, dones, self.legal_actions.copy()
+
+    def close(self):
+        '''
+        Closes every environment.
+        '''
+        for env in self.envs:
+            env.close()
+
+
+def pool_worker(connection, opponent_path, num_envs, config, seed, log_dir):
+    '''
+    Runs a VectorEnv in a worker process, answering reset, step and close commands.
+    '''
+    envs = VectorEnv(opponent_path, num_envs, config, seed, log_dir)
+    while True:
+        command, data = connection.recv()
+        if command == 'reset':
+            connection.send(envs.reset())
+        elif command == 'step':
+            connection.send(envs.step(data))
+        else:
+            envs.close()
+            connection.send(None)
+            connection.close()
+            return
+
+
+class PoolVectorEnv():
+    '''
+    VectorEnvs in a pool of worker processes, stepped in parallel and presented as one VectorEnv.
+    '''
+
+    def __init__(self, opponent_path, num_workers, envs_per_worker, config=None, seed=None, log_dir=None):
+        self.log_dir = tempfile.mkdtemp(prefix='pokerbots-env-') if log_dir is None else log_dir
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        self.envs_per_worker = envs_per_worker
+        self.connections = []
+        self.workers = []
+        for index in range(num_workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker_dir = os.path.join(self.log_dir, 'worker_{}'.format(index))
+            os.makedirs(worker_dir, exist_ok=True)
+            worker = multiprocessing.Process(target=pool_worker, daemon=True,
+                                             args=(worker_connection, opponent_path, envs_per_worker, config,
+                                                   seed + index * envs_per_worker, worker_dir))
+            worker.start()
+            self.connections.append(connection)
+            self.workers.append(worker)
+
+    def gather(self):
+        '''
+        Receives every worker's reply and joins them into one row per environment.
+        '''
+        replies = [connection.recv() for connection in self.connections]
+        return tuple(np.concatenate(parts) for parts in zip(*replies))
+
+    def reset(self):
+        '''
+        Starts a round in every environment and returns the observations and legal action masks.
+        '''
+        for connection in self.connections:
+            connection.send(('reset', None))
+        return self.gather()
+
+    def step(self, actions):
+        '''
+        Performs one action in every environment and returns the observations, rewards, whether
+        each round ended and the legal action masks.
+        '''
+        for index, connection in enumerate(self.connections):
+            connection.send(('step', actions[index * self.envs_per_worker:(index + 1) * self.envs_per_worker]))
+        return self.gather()
+
+    def close(self):
+        '''
+        Closes every environment and stops the workers.
+        '''
+        for connection in self.connections:
+            connection.send(('close', None))
+        for connection, worker in zip(self.connections, self.workers):
+            connection.recv()
+            worker.join()
+
+
+def random_actions(legal_actions, rng):
+    '''
+    Returns a uniformly random legal action index for each legal action mask.
+    '''
+    allowed = (legal_actions[:, None] >> np.arange(len(ACTIONS))) & 1 == 1
+    choices = rng.random(allowed.shape) * allowed
+    return choices.argmax(axis=1)
+
+
+def parse_args():
+    '''
+    Parses the environment benchmark's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 poker_env.py')
+    parser.add_argument('opponent', help='The pokerbot to play against: a directory with a commands.json, or a Python script in one')
+    parser.add_argument('--envs', type=int, default=256, help='Environments per process')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes, 0 to step the environments in this process')
+    parser.add_argument('--steps', type=int, default=100, help='Steps of every environment to time')
+    parser.add_argument('--seed', type=int, default=None)
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # plays a uniformly random policy and reports the throughput and its average reward
+    args = parse_args()
+    config = config_from_args(args)
+    if args.workers:
+        envs = PoolVectorEnv(args.opponent, args.workers, args.envs, config, args.seed)
+    else:
+        envs = VectorEnv(args.opponent, args.envs, config, args.seed)
+    rng = np.random.default_rng(args.seed)
+    observations, legal_actions = envs.reset()
+    rounds = 0
+    total_reward = 0.
+    start_time = time.perf_counter()
+    for _ in range(args.steps):
+        observations, rewards, dones, legal_actions = envs.step(random_actions(legal_actions, rng))
+        rounds += int(dones.sum())
+        total_reward += float(rewards.sum())
+    seconds = time.perf_counter() - start_time
+    envs.close()
+    print('{} environments, {} steps each in {:.2f}s'.format(len(observations), args.steps, seconds))
+    print('{:.0f} steps/sec, {:.0f} rounds/sec, {:.2f} reward per round for the random policy'.format(
+        len(observations) * args.steps / seconds, rounds / seconds, total_reward / max(rounds, 1)))
+    print('Opponent output kept in', envs.log_dir)
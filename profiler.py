@@ -0,0 +1,199 @@
+'''
+Measures where the engine spends its time during a game, separating its own work from the bots'.
+
+The profiler times sections of the engine by wrapping the methods which implement them for the
+duration of one game: dealing, RoundState.proceed, showdown and its eval7.evaluate calls, log
+formatting and writing, the hand history, socket writes and the time spent waiting for each bot's
+reply. Sections nest, and each is charged only its own time, not that of the sections it calls.
+
+The report is a per-section summary of the play phase. The timed section stacks can also be written
+in the collapsed format read by flamegraph.pl and speedscope.
+'''
+from collections import defaultdict
+import contextlib
+import functools
+import cProfile
+import time
+import sys
+
+
+class TimedSocketFile():
+    '''
+    Wraps a pokerbot's socket file, charging writes to socket I/O and reads to waiting on the pokerbot.
+    '''
+
+    def __init__(self, socketfile, profiler, name):
+        self.socketfile = socketfile
+        self.write = profiler.timed('socket I/O', socketfile.write)
+        self.flush = profiler.timed('socket I/O', socketfile.flush)
+        self.readline = profiler.timed('waiting on ' + name, socketfile.readline)
+
+    def __getattr__(self, name):
+        return getattr(self.socketfile, name)
+
+
+class TimedEval7():
+    '''
+    Stands in for the eval7 module inside the engine only, so that in-process bots' own hand
+    evaluations are not charged to the engine.
+    '''
+
+    def __init__(self, eval7, profiler):
+        self.eval7 = eval7
+        self.evaluate = profiler.timed('eval7.evaluate', eval7.evaluate)
+
+    def __getattr__(self, name):
+        return getattr(self.eval7, name)
+
+
+class EngineProfiler():
+    '''
+    Accumulates the self time and call count of every stack of timed sections.
+    '''
+
+    def __init__(self):
+        self.stack = []
+        self.sections = defaultdict(lambda: [0., 0])
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.])
+
+    def exit(self):
+        name, start_time, child_time = self.stack.pop()
+        elapsed = time.perf_counter() - start_time
+        section = self.sections[tuple(frame[0] for frame in self.stack) + (name,)]
+        section[0] += elapsed - child_time
+        section[1] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def timed(self, name, function):
+        '''
+        Returns function wrapped so that each call is timed as the named section.
+        '''
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapper
+
+    @contextlib.contextmanager
+    def instrument(self, game):
+        '''
+        Times the sections of the engine while the game runs, restoring the engine afterwards.
+        '''
+        engine = sys.modules[type(game).__module__]
+        patches = []
+
+        def patch(owner, attribute, replacement):
+            patches.append((owner, attribute, owner.__dict__[attribute]))
+            setattr(owner, attribute, replacement)
+
+        def time_method(cls, method, name):
+            # only the most derived definition, which any overridden ones run inside of
+            owner = next(owner for owner in cls.__mro__ if method in owner.__dict__)
+            if not any(patched[:2] == (owner, method) for patched in patches):
+                patch(owner, method, self.timed(name, owner.__dict__[method]))
+
+        time_method(type(game), 'run_round', 'round')
+        time_method(type(game), 'start_round', 'start round')
+        time_method(type(game), 'end_round', 'end round')
+        for method in ('log_round_state', 'log_action', 'log_terminal_state'):
+            time_method(type(game), method, 'log formatting')
+        time_method(engine.DealSchedule, 'deal', 'deal')
+        time_method(engine.RoundState, 'proceed', 'proceed')
+        time_method(engine.RoundState, 'showdown', 'showdown')
+        time_method(engine.RoundState, 'expected_delta', 'all-in equity')
+        time_method(engine.GameLog, 'flush', 'log writes')
+        time_method(engine.HandHistoryWriter, 'write_round', 'hand history')
+        patch(engine, 'eval7', TimedEval7(engine.eval7, self))
+        for player in game.players:
+            time_method(type(player), 'query', 'query')
+        profiler = self
+
+        def run(player, original_run):
+            @functools.wraps(original_run)
+            def wrapper():
+                original_run()
+                # time the pokerbot once it is connected, however it was started
+                if getattr(player, 'runner', None) is not None:
+                    player.runner.handle_packet = profiler.timed('waiting on ' + player.name, player.runner.handle_packet)
+                elif player.socketfile is not None and not isinstance(player.socketfile, TimedSocketFile):
+                    player.socketfile = TimedSocketFile(player.socketfile, profiler, player.name)
+            return wrapper
+        for player in game.players:
+            player.run = run(player, player.run)
+        try:
+            yield self
+        finally:
+            for owner, attribute, original in reversed(patches):
+                setattr(owner, attribute, original)
+            for player in game.players:
+                del player.run
+                if isinstance(player.socketfile, TimedSocketFile):
+                    player.socketfile = player.socketfile.socketfile
+
+    def totals(self):
+        '''
+        Returns the self time and call count of each section name, over every stack it appears in.
+
+        Anything timed while waiting on a bot, such as an in-process bot calling back into the
+        engine's classes, counts as waiting on that bot.
+        '''
+        totals = defaultdict(lambda: [0., 0])
+        for stack, (seconds, calls) in self.sections.items():
+            name = next((frame for frame in stack if frame.startswith('waiting on ')), stack[-1])
+            totals[name][0] += seconds
+            totals[name][1] += calls if name == stack[-1] else 0
+        return totals
+
+    def report(self, play_seconds, num_rounds):
+        '''
+        Prints each section's share of the play phase, and how much of it was the engine's own.
+        '''
+        totals = self.totals()
+        waiting = sum(seconds for name, (seconds, _) in totals.items() if name.startswith('waiting on '))
+        untimed = play_seconds - sum(seconds for seconds, _ in totals.values())
+        num_rounds = max(num_rounds, 1)
+        print('Profile of {} rounds, {:.3f}s of play'.format(num_rounds, play_seconds))
+        print('{:<24}{:>10}{:>12}{:>14}{:>8}'.format('Section', 'Calls', 'Self time', 'Per round', 'Share'))
+        rows = sorted(totals.items(), key=lambda item: item[1][0], reverse=True) + [('untimed', [untimed, 0])]
+        for name, (seconds, calls) in rows:
+            print('{:<24}{:>10}{:>11.3f}s{:>12.1f}us{:>7.1f}%'.format(
+                name, calls, seconds, seconds / num_rounds * 1e6, 100 * seconds / max(play_seconds, 1e-9)))
+        print('Engine {:.3f}s ({:.1f}us per round), bots {:.3f}s'.format(
+            play_seconds - waiting, (play_seconds - waiting) / num_rounds * 1e6, waiting))
+
+    def profile(self, game, stacks_filename=None, cprofile_filename=None):
+        '''
+        Runs the game with its sections timed, prints the report and returns the game's result.
+
+        Optionally writes the section stacks, and a cProfile of the whole engine process which
+        pstats, snakeviz or flameprof can read.
+        '''
+        profile = cProfile.Profile() if cprofile_filename is not None else None
+        with self.instrument(game):
+            if profile is not None:
+                profile.enable()
+            try:
+                result = game.run()
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    profile.dump_stats(cprofile_filename)
+        self.report(game.phase_times['play']['wall'], len(game.rounds))
+        if stacks_filename is not None:
+            self.write_stacks(stacks_filename)
+        return result
+
+    def write_stacks(self, filename):
+        '''
+        Writes the section stacks in collapsed flame graph format, one stack per line with its self
+        time in microseconds.
+        '''
+        with open(filename, 'w') as stacks_file:
+            for stack, (seconds, _) in sorted(self.sections.items()):
+                stacks_file.write('{} {}\n'.format(';'.join(stack), int(seconds * 1e6)))
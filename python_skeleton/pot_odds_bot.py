@@ -3,7 +3,6 @@ Simple example pokerbot, written in Python.
 '''
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
 from skeleton.states import GameState, TerminalState, RoundState
-from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
 
@@ -145,8 +144,8 @@ class Player(Bot):
         opp_stack = round_state.stacks[1-active]  # the number of chips your opponent has remaining
         continue_cost = opp_pip - my_pip  # the number of chips needed to stay in the pot
         my_bounty = round_state.bounties[active]  # your current bounty rank
-        my_contribution = STARTING_STACK - my_stack  # the number of chips you have contributed to the pot
-        opp_contribution = STARTING_STACK - opp_stack  # the number of chips your opponent has contributed to the pot
+        my_contribution = game_state.parameters.starting_stack - my_stack  # the number of chips you have contributed to the pot
+        opp_contribution = game_state.parameters.starting_stack - opp_stack  # the number of chips your opponent has contributed to the pot
 
         strength = self.calculate_strength(my_cards, board_cards)
         pot_odds = continue_cost / (my_pip + opp_pip + 0.1)
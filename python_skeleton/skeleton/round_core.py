@@ -0,0 +1,249 @@
+'''
+A compact, integer-encoded round of poker under the engine's rules, for fast simulation.
+
+RoundState objects are immutable and chained: every action copies the pips and stacks into a new
+state which links to the previous one, and legal_actions() builds a new set each time. A RoundCore
+holds the same round in a handful of slots and is advanced in place, so an action allocates
+nothing. Cards are indices into an unshuffled eval7.Deck (4 * rank + suit, as in DealSchedule),
+bounties are rank indices, and actions and sets of legal actions are bit masks.
+
+The betting and bounty rules are module functions, which the engine's and the skeletons' RoundState
+classes also call, so every implementation plays exactly the same game. This file is shared
+verbatim by the engine and the skeletons.
+'''
+from collections import namedtuple
+from functools import lru_cache
+import math
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+# the order of an unshuffled eval7.Deck
+CARD_NAMES = [rank + suit for rank in RANKS for suit in SUITS]
+CARD_INDEX = {name: index for index, name in enumerate(CARD_NAMES)}
+RANK_BITS = [1 << (index >> 2) for index in range(len(CARD_NAMES))]
+
+# the bounty rank of a player whose bounty is unknown, which no card hits
+NO_BOUNTY = len(RANKS)
+
+# the actions, each a bit of a legal action mask
+FOLD = 1
+CALL = 2
+CHECK = 4
+RAISE = 8
+
+Rules = namedtuple('Rules', ['starting_stack', 'small_blind', 'big_blind', 'bounty_ratio', 'bounty_constant'])
+DEFAULT_RULES = Rules(400, 1, 2, 1.5, 10)
+
+
+def encode_card(card):
+    '''
+    Returns the index of a card given as a string such as 'Ah' or an eval7.Card.
+    '''
+    return CARD_INDEX[str(card)]
+
+
+def encode_rank(rank):
+    '''
+    Returns the index of a bounty rank such as 'A', or NO_BOUNTY for anything else.
+    '''
+    return RANKS.index(rank) if len(rank) == 1 and rank in RANKS else NO_BOUNTY
+
+
+def action_sets(fold_type, call_type, check_type, raise_type):
+    '''
+    Returns a table from each legal action mask to the frozenset of the corresponding action types.
+    '''
+    types = [(FOLD, fold_type), (CALL, call_type), (CHECK, check_type), (RAISE, raise_type)]
+    return [frozenset(action_type for bit, action_type in types if mask & bit) for mask in range(16)]
+
+
+@lru_cache(maxsize=None)
+def hand_evaluator():
+    '''
+    Returns the eval7.Card of each card index and eval7.evaluate. eval7 is only imported once a
+    showdown is simulated, so pokerbots which never simulate one don't load it.
+    '''
+    import eval7
+    return [eval7.Card(name) for name in CARD_NAMES], eval7.evaluate
+
+
+def legal_mask(button, pips, stacks):
+    '''
+    Returns the mask of the active player's legal actions.
+    '''
+    active = button & 1
+    continue_cost = pips[1-active] - pips[active]
+    if continue_cost == 0:
+        # we can only raise the stakes if both players can afford it
+        return CHECK | FOLD if stacks[0] == 0 or stacks[1] == 0 else CHECK | RAISE | FOLD
+    # similarly, re-raising is only allowed if both players can afford it
+    return FOLD | CALL if continue_cost == stacks[active] or stacks[1-active] == 0 else FOLD | CALL | RAISE
+
+
+def raise_bounds(button, pips, stacks, big_blind):
+    '''
+    Returns a tuple of the minimum and maximum legal raises.
+    '''
+    active = button & 1
+    continue_cost = pips[1-active] - pips[active]
+    max_contribution = min(stacks[active], stacks[1-active] + continue_cost)
+    min_contribution = min(max_contribution, continue_cost + max(continue_cost, big_blind))
+    return (pips[active] + min_contribution, pips[active] + max_contribution)
+
+
+def bounty_delta(winner_index, stacks, bounty_hits, button, starting_stack, bounty_ratio, bounty_constant):
+    '''
+    Returns player 0's delta when the round ends with these stacks, after bounty rules are applied.
+
+    winner_index is 0 or 1 for the winning player, or 2 for a split pot. A non-integer delta is
+    rounded down or up depending on who is in position.
+    '''
+    hit_0, hit_1 = bounty_hits
+    if winner_index == 2:
+        # split pots only happen on the river with equal stacks
+        assert(stacks[0] == stacks[1])
+        delta = starting_stack - stacks[0]
+        if hit_0 and not hit_1:
+            delta = delta * (bounty_ratio - 1) / 2 + bounty_constant
+        elif not hit_0 and hit_1:
+            delta = -(delta * (bounty_ratio - 1) / 2 + bounty_constant)
+        else:
+            delta = 0
+    elif winner_index == 0:
+        delta = starting_stack - stacks[1]
+        if hit_0:
+            delta = delta * bounty_ratio + bounty_constant
+    else:
+        delta = stacks[0] - starting_stack
+        if hit_1:
+            delta = delta * bounty_ratio - bounty_constant
+    if abs(delta - math.floor(delta)) > 1e-6:
+        delta = math.floor(delta) if button & 1 == 0 else math.ceil(delta)
+    return int(delta)
+
+
+class RoundCore():
+    '''
+    One round of poker, advanced in place.
+
+    cards holds the 9 card indices of the round: player 0's hand, player 1's hand, then the five
+    board cards, of which the first `street` are dealt. Once the round is over, delta is player 0's
+    delta and bounty_hits says which players hit their bounty; until then delta is None.
+    '''
+    __slots__ = ('button', 'street', 'pips', 'stacks', 'cards', 'bounties', 'rules', 'delta', 'bounty_hits')
+
+    def __init__(self, cards, bounties, rules=DEFAULT_RULES, button=0, street=0, pips=None, stacks=None):
+        self.button = button
+        self.street = street
+        self.pips = list(pips) if pips is not None else [rules.small_blind, rules.big_blind]
+        self.stacks = list(stacks) if stacks is not None else [rules.starting_stack - pip for pip in self.pips]
+        self.cards = cards
+        self.bounties = bounties
+        self.rules = rules
+        self.delta = None
+        self.bounty_hits = None
+
+    def copy(self):
+        '''
+        Returns an independent copy of the round, for exploring several continuations.
+        '''
+        core = RoundCore.__new__(RoundCore)
+        core.button = self.button
+        core.street = self.street
+        core.pips = self.pips[:]
+        core.stacks = self.stacks[:]
+        core.cards = self.cards
+        core.bounties = self.bounties
+        core.rules = self.rules
+        core.delta = self.delta
+        core.bounty_hits = self.bounty_hits
+        return core
+
+    def legal_actions(self):
+        '''
+        Returns the mask of the active player's legal actions.
+        '''
+        return legal_mask(self.button, self.pips, self.stacks)
+
+    def raise_bounds(self):
+        '''
+        Returns a tuple of the minimum and maximum legal raises.
+        '''
+        return raise_bounds(self.button, self.pips, self.stacks, self.rules.big_blind)
+
+    def get_bounty_hits(self):
+        '''
+        Returns whether each player's bounty rank is among their hole cards or the board dealt so far.
+        '''
+        cards = self.cards
+        board = 0
+        for card in cards[4:4 + self.street]:
+            board |= RANK_BITS[card]
+        ranks_0 = board | RANK_BITS[cards[0]] | RANK_BITS[cards[1]]
+        ranks_1 = board | RANK_BITS[cards[2]] | RANK_BITS[cards[3]]
+        return (ranks_0 >> self.bounties[0] & 1 == 1, ranks_1 >> self.bounties[1] & 1 == 1)
+
+    def finish(self, winner_index):
+        '''
+        Ends the round with the given winner, 2 for a split pot.
+        '''
+        rules = self.rules
+        self.bounty_hits = self.get_bounty_hits()
+        self.delta = bounty_delta(winner_index, self.stacks, self.bounty_hits, self.button,
+                                  rules.starting_stack, rules.bounty_ratio, rules.bounty_constant)
+        return True
+
+    def showdown(self):
+        '''
+        Compares the players' hands with eval7 and ends the round.
+        '''
+        eval7_cards, evaluate = hand_evaluator()
+        cards = self.cards
+        board = [eval7_cards[card] for card in cards[4:9]]
+        score0 = evaluate(board + [eval7_cards[cards[0]], eval7_cards[cards[1]]])
+        score1 = evaluate(board + [eval7_cards[cards[2]], eval7_cards[cards[3]]])
+        return self.finish(0 if score0 > score1 else 1 if score0 < score1 else 2)
+
+    def proceed_street(self):
+        '''
+        Resets the players' pips and advances to the next round of betting, or to showdown.
+        '''
+        if self.street == 5:
+            return self.showdown()
+        self.street = 3 if self.street == 0 else self.street + 1
+        self.button = 1
+        self.pips[0] = self.pips[1] = 0
+        return False
+
+    def proceed(self, action, amount=0):
+        '''
+        Performs one action of the active player, given as FOLD, CALL, CHECK or RAISE with the
+        amount raised to. Returns whether the action ended the round.
+        '''
+        active = self.button & 1
+        if action == CHECK:
+            if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
+                return self.proceed_street()
+            self.button += 1
+            return False
+        if action == CALL:
+            pips, stacks = self.pips, self.stacks
+            if self.button == 0:  # sb calls bb
+                big_blind = self.rules.big_blind
+                pips[0] = pips[1] = big_blind
+                stacks[0] = stacks[1] = self.rules.starting_stack - big_blind
+                self.button = 1
+                return False
+            contribution = pips[1-active] - pips[active]
+            stacks[active] -= contribution
+            pips[active] += contribution
+            self.button += 1
+            return self.proceed_street()
+        if action == RAISE:
+            contribution = amount - self.pips[active]
+            self.stacks[active] -= contribution
+            self.pips[active] += contribution
+            self.button += 1
+            return False
+        # the active player folds, so the other one wins
+        return self.finish(1 - active)
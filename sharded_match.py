@@ -0,0 +1,195 @@
+'''
+Plays one long match as contiguous shards of its rounds in parallel worker processes, then merges
+the shards into the bankrolls, game log, hand history and latency report of the whole match.
+
+Every round is dealt from the match's seed on its own, so a shard deals exactly the cards the whole
+match would, and shards start where the deal schedule resets the bounties, so that no bounty block
+or duplicate pair is split. Each shard starts fresh pokerbots, which are only told the round they
+start at, so sharding suits pokerbots which keep no state between rounds, such as ones run in an
+evaluation mode. Each shard's game clock is its rounds' share of the match's clock.
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from array import array
+import contextlib
+import argparse
+import random
+import shutil
+import json
+import time
+import re
+import os
+
+from engine import Game, Player, InProcessPlayer, DealSchedule, LatencyStats, PVALUE
+from game_config import GameConfig, add_config_arguments, config_from_args
+from hand_history import HandHistoryWriter, read_rounds
+from tournament import build_bots
+
+# the game log lines which end with the running bankroll of each player
+STATUS_PREFIXES = ('Round #', 'Winning counts at the end of the round: ')
+
+
+def shard_rounds(schedule, num_shards):
+    '''
+    Splits the rounds of a DealSchedule into at most num_shards contiguous ranges of nearly equal
+    length, each starting at a round where new bounties are drawn.
+    '''
+    starts = [round_num for round_num in range(1, schedule.num_rounds + 1) if schedule.resets_bounties(round_num)]
+    num_shards = max(1, min(num_shards, len(starts)))
+    bounds = [starts[len(starts) * shard // num_shards] for shard in range(num_shards)] + [schedule.num_rounds + 1]
+    return [range(start, end) for start, end in zip(bounds, bounds[1:])]
+
+
+def play_shard(shard_dir, names, paths, seed, rounds, config):
+    '''
+    Plays one shard of the match in the current process, writing all of its output into shard_dir.
+
+    Returns the bankroll, the all-in adjusted bankroll and the response time samples of each player
+    by name.
+    '''
+    os.makedirs(shard_dir, exist_ok=True)
+    player_class = InProcessPlayer if config.IN_PROCESS_BOTS else Player
+    players = [player_class(name, path, shard_dir, config=config) for name, path in zip(names, paths)]
+    with open(os.path.join(shard_dir, 'engine.txt'), 'w') as engine_output:
+        with contextlib.redirect_stdout(engine_output):
+            bankrolls = Game(players, shard_dir, seed=seed, rounds=rounds, write_latency=False,
+                             early_stopping=False, config=config).run()
+    return (bankrolls, {player.name: player.adjusted_bankroll for player in players},
+            {player.name: player.latency.samples for player in players})
+
+
+def shift_status(line, patterns, offsets):
+    '''
+    Adds each player's bankroll from the earlier shards to a status line of a shard's game log.
+    '''
+    for name, pattern in patterns.items():
+        line = pattern.sub(lambda match: '{}{})'.format(match.group(1), int(match.group(2)) + offsets[name]), line)
+    return line
+
+
+def merge_game_logs(filename, shard_filenames, offsets, final_lines):
+    '''
+    Joins the shards' game logs into the log of the whole match, in which the running bankrolls
+    count the rounds of the earlier shards. offsets holds each player's bankroll by name before
+    each shard, and final_lines replace the final bankrolls each shard ends with.
+    '''
+    patterns = {name: re.compile('(, ' + re.escape(name) + r' \()(-?\d+)\)') for name in offsets[0]}
+    lines = []
+    for shard, (shard_filename, offset) in enumerate(zip(shard_filenames, offsets)):
+        with open(shard_filename, 'r') as shard_file:
+            shard_lines = shard_file.read().split('\n')
+        # every shard repeats the header, and ends with a blank line and its own final bankrolls
+        end = next(index for index, line in enumerate(shard_lines) if line.startswith('Final')) - 1
+        lines.extend(shard_lines[:2] if shard == 0 else [])
+        lines.extend(shift_status(line, patterns, offset) if line.startswith(STATUS_PREFIXES) else line
+                     for line in shard_lines[2:end])
+    with open(filename, 'w') as log_file:
+        log_file.write('\n'.join(lines + [''] + final_lines))
+
+
+def merge_hand_histories(filename, shard_filenames, names, seed):
+    '''
+    Joins the shards' hand histories into one file with an index over every round.
+    '''
+    writer = HandHistoryWriter(filename, names, seed)
+    for shard_filename in shard_filenames:
+        for record in read_rounds(shard_filename):
+            writer.offsets[record['round']] = writer.write_record(record)
+    writer.close()
+
+
+def merge_player_logs(filename, shard_filenames, shards):
+    '''
+    Concatenates a pokerbot's logs from every shard, each under a line naming its rounds.
+    '''
+    with open(filename, 'wb') as log_file:
+        for shard_filename, rounds in zip(shard_filenames, shards):
+            log_file.write('[rounds {} to {}]\n'.format(rounds[0], rounds[-1]).encode())
+            if os.path.exists(shard_filename):
+                with open(shard_filename, 'rb') as shard_file:
+                    shutil.copyfileobj(shard_file, log_file)
+
+
+def run_sharded_match(num_shards=None, workers=None, output_dir='.', config=None):
+    '''
+    Plays config.py's two pokerbots over every round of one match, split into num_shards shards
+    played on at most `workers` processes, and returns the final bankroll of each player by name.
+
+    The merged output is written to output_dir as the engine would write it, and each shard's own
+    output to a directory under output_dir/shards. Early stopping and checkpoints don't apply.
+    '''
+    config = GameConfig() if config is None else config
+    workers = workers or os.cpu_count()
+    seed = random.randrange(2 ** 32) if config.SEED is None else config.SEED
+    schedule = DealSchedule(seed, config.NUM_ROUNDS, config.DUPLICATE_DEALS, config.ROUNDS_PER_BOUNTY)
+    shards = shard_rounds(schedule, num_shards or workers)
+    names = [config.PLAYER_1_NAME, config.PLAYER_2_NAME]
+    paths = [config.PLAYER_1_PATH, config.PLAYER_2_PATH]
+    shards_dir = os.path.join(output_dir, 'shards')
+    shard_dirs = [os.path.join(shards_dir, 'shard_{:03d}'.format(shard)) for shard in range(len(shards))]
+    build_dir = os.path.join(shards_dir, 'builds')
+    os.makedirs(build_dir, exist_ok=True)
+    build_bots(names, paths, build_dir, config)
+    print('Playing {} rounds in {} shards with seed {}'.format(config.NUM_ROUNDS, len(shards), seed))
+    start_time = time.perf_counter()
+    results = [None] * len(shards)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for shard, (shard_dir, rounds) in enumerate(zip(shard_dirs, shards)):
+            shard_config = config.replace(STARTING_GAME_CLOCK=config.STARTING_GAME_CLOCK * len(rounds) / config.NUM_ROUNDS,
+                                          CHECKPOINT_ROUNDS=None)
+            futures[executor.submit(play_shard, shard_dir, names, paths, seed, rounds, shard_config)] = shard
+        for future in as_completed(futures):
+            shard = futures[future]
+            results[shard] = future.result()
+            print('Rounds {} to {}: {}'.format(shards[shard][0], shards[shard][-1], results[shard][0]))
+    print('Played in {:.3f}s'.format(time.perf_counter() - start_time))
+
+    offsets = [{name: 0 for name in names}]
+    bankrolls = {name: 0 for name in names}
+    adjusted_bankrolls = {name: 0. for name in names}
+    latencies = {name: LatencyStats() for name in names}
+    for shard_bankrolls, shard_adjusted, shard_samples in results:
+        for name in names:
+            bankrolls[name] += shard_bankrolls[name]
+            adjusted_bankrolls[name] += shard_adjusted[name]
+            for key, samples in shard_samples[name].items():
+                latencies[name].samples.setdefault(key, array('d')).extend(samples)
+        offsets.append(dict(bankrolls))
+    # the players in seat order after the last round, as the engine reports them
+    seated = names if (config.NUM_ROUNDS + 1) % 2 == 1 else names[::-1]
+    final_lines = ['Final' + ''.join(PVALUE(name, bankrolls[name]) for name in seated)]
+    if config.ALL_IN_EQUITY:
+        final_lines.append('Final all-in adjusted' + ''.join(PVALUE(name, '{:.2f}'.format(adjusted_bankrolls[name]))
+                                                             for name in seated))
+    log_name = config.GAME_LOG_FILENAME
+    if config.WRITE_GAME_LOG:
+        print('Writing', os.path.join(output_dir, log_name + '.txt'))
+        merge_game_logs(os.path.join(output_dir, log_name + '.txt'),
+                        [os.path.join(shard_dir, log_name + '.txt') for shard_dir in shard_dirs], offsets, final_lines)
+    if config.WRITE_HAND_HISTORY:
+        merge_hand_histories(os.path.join(output_dir, log_name + '.jsonl'),
+                             [os.path.join(shard_dir, log_name + '.jsonl') for shard_dir in shard_dirs], names, seed)
+    if config.WRITE_LATENCY_STATS:
+        with open(os.path.join(output_dir, log_name + '_latency.json'), 'w') as latency_file:
+            json.dump({name: latencies[name].report() for name in seated}, latency_file, indent=2)
+    for name in names:
+        merge_player_logs(os.path.join(output_dir, name + '.txt'),
+                          [os.path.join(shard_dir, name + '.txt') for shard_dir in shard_dirs], shards)
+    return {name: bankrolls[name] for name in seated}
+
+
+def parse_args():
+    '''
+    Parses the sharded match's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 sharded_match.py')
+    parser.add_argument('--shards', type=int, default=None, help='Shards to split the match into, defaults to the workers')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent shards, defaults to the number of cores')
+    parser.add_argument('--output-dir', type=str, default='.', help='Directory for the merged and per-shard output')
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print(run_sharded_match(args.shards, args.workers, args.output_dir, config_from_args(args)))
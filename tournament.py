@@ -0,0 +1,204 @@
+'''
+Plays engine matches between many pokerbots concurrently and merges the results into standings.
+
+Every match runs in its own worker process and writes its gamelog and player logs into its own
+directory, so matches never overwrite each other's output. With warm bots, each worker process keeps
+the pokerbots it has started running between matches instead of restarting them every match.
+'''
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+import contextlib
+import itertools
+import argparse
+import json
+import os
+
+from engine import Game, Player, InProcessPlayer, BotPool, bot_location
+from game_config import add_config_arguments, config_from_args
+
+# the warm pokerbots of this worker process, created by its first match
+WORKER_POOL = None
+
+
+def bot_names(paths):
+    '''
+    Names each pokerbot after its directory or script, numbering repeated names.
+    '''
+    names = []
+    counts = {}
+    for path in paths:
+        directory, script = bot_location(path)
+        name = os.path.basename(os.path.normpath(directory)) if script is None else script[:-len('.py')]
+        counts[name] = counts.get(name, 0) + 1
+        names.append(name if counts[name] == 1 else '{}_{}'.format(name, counts[name]))
+    return names
+
+
+def schedule(num_bots, mode, matches_per_pairing):
+    '''
+    Returns the (seat A, seat B) bot indices of every match in the tournament.
+
+    In round-robin mode every pair of pokerbots meets; in gauntlet mode the first pokerbot
+    meets every other one. Seats alternate between repeated matches of the same pairing.
+    '''
+    if mode == 'gauntlet':
+        pairings = [(0, other) for other in range(1, num_bots)]
+    else:
+        pairings = list(itertools.combinations(range(num_bots), 2))
+    return [pairing if repeat % 2 == 0 else pairing[::-1]
+            for pairing in pairings for repeat in range(matches_per_pairing)]
+
+
+def build_bots(names, paths, output_dir, config=None):
+    '''
+    Builds every distinct pokerbot concurrently, writing each build's output into output_dir.
+
+    Successful builds land in the build cache, so the matches themselves skip building. Scripts in
+    the same pokerbot directory share one build.
+    '''
+    builds = {}
+    for name, path in zip(names, paths):
+        builds.setdefault(os.path.abspath(bot_location(path)[0]), Player(name, path, output_dir, config=config))
+    with ThreadPoolExecutor(max_workers=len(builds) or 1) as executor:
+        list(executor.map(Player.build, builds.values()))
+    for player in builds.values():
+        player.output.close()
+
+
+def worker_pool(player_class):
+    '''
+    Returns this worker process's BotPool, which stops its pokerbots when the worker exits.
+    '''
+    global WORKER_POOL
+    if WORKER_POOL is None:
+        WORKER_POOL = BotPool(player_class)
+        # pool workers exit without running atexit handlers, but they do run multiprocessing finalizers
+        Finalize(WORKER_POOL, WORKER_POOL.close, exitpriority=10)
+    return WORKER_POOL
+
+
+def play_match(match_dir, names, paths, in_process, duplicate, warm=False, early_stopping=False, config=None,
+               resume=False):
+    '''
+    Plays one match in the current process, writing all of its output into match_dir.
+
+    The config, a GameConfig defaulting to config.py, may differ between the matches of one worker,
+    so that parameter sweeps can share a pool. With resume, a match which already finished returns
+    its recorded result, and an interrupted one continues from its checkpoint.
+
+    Returns the final bankroll and the all-in adjusted bankroll of each player by name.
+    '''
+    os.makedirs(match_dir, exist_ok=True)
+    result_filename = os.path.join(match_dir, 'result.json')
+    if resume and os.path.exists(result_filename):
+        with open(result_filename, 'r') as result_file:
+            return tuple(json.load(result_file))
+    player_class = InProcessPlayer if in_process else Player
+    if warm:
+        pool = worker_pool(player_class)
+        players = [pool.checkout(name, path, match_dir, config) for name, path in zip(names, paths)]
+    else:
+        players = [player_class(name, path, match_dir, config=config) for name, path in zip(names, paths)]
+    try:
+        with open(os.path.join(match_dir, 'engine.txt'), 'a' if resume else 'w') as engine_output:
+            with contextlib.redirect_stdout(engine_output):
+                bankrolls = Game(players, match_dir, duplicate, early_stopping=early_stopping, config=config,
+                                 resume=resume).run()
+        result = bankrolls, {player.name: player.adjusted_bankroll for player in players}
+        with open(result_filename, 'w') as result_file:
+            json.dump(result, result_file)
+        return result
+    finally:
+        if warm:
+            pool.checkin(players)
+
+
+def standings(names, results):
+    '''
+    Merges the bankrolls of finished matches into one standings row per pokerbot.
+    '''
+    table = {name: {'name': name, 'matches': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'bankroll': 0, 'adjusted': 0.}
+             for name in names}
+    for result, adjusted in results:
+        (name_a, bankroll_a), (name_b, bankroll_b) = result.items()
+        for name, bankroll, other in ((name_a, bankroll_a, bankroll_b), (name_b, bankroll_b, bankroll_a)):
+            row = table[name]
+            row['matches'] += 1
+            row['bankroll'] += bankroll
+            row['adjusted'] += adjusted[name]
+            if bankroll > other:
+                row['wins'] += 1
+            elif bankroll < other:
+                row['losses'] += 1
+            else:
+                row['ties'] += 1
+    return sorted(table.values(), key=lambda row: (row['wins'], row['bankroll']), reverse=True)
+
+
+def run_tournament(paths, mode='round-robin', matches_per_pairing=1, workers=None,
+                   output_dir='tournament', in_process=False, duplicate=False, warm=False, early_stopping=False,
+                   config=None, resume=False):
+    '''
+    Plays every scheduled match on a pool of at most `workers` processes and returns the standings.
+    '''
+    names = bot_names(paths)
+    matches = schedule(len(paths), mode, matches_per_pairing)
+    results = []
+    os.makedirs(output_dir, exist_ok=True)
+    build_dir = os.path.join(output_dir, 'builds')
+    os.makedirs(build_dir, exist_ok=True)
+    build_bots(names, paths, build_dir, config)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {}
+        for match_num, (seat_a, seat_b) in enumerate(matches, 1):
+            match_dir = os.path.join(output_dir, 'match_{:04d}_{}_vs_{}'.format(match_num, names[seat_a], names[seat_b]))
+            future = executor.submit(play_match, match_dir, [names[seat_a], names[seat_b]],
+                                     [paths[seat_a], paths[seat_b]], in_process, duplicate, warm, early_stopping, config, resume)
+            futures[future] = match_dir
+        for future in as_completed(futures):
+            result = future.result()
+            print(os.path.basename(futures[future]), result[0])
+            results.append(result)
+    table = standings(names, results)
+    with open(os.path.join(output_dir, 'standings.json'), 'w') as standings_file:
+        json.dump(table, standings_file, indent=2)
+    return table
+
+
+def print_standings(table):
+    '''
+    Prints the standings as a fixed-width table.
+    '''
+    print('{:<24}{:>8}{:>6}{:>8}{:>6}{:>12}{:>12}'.format('Bot', 'Matches', 'Wins', 'Losses', 'Ties', 'Bankroll', 'Adjusted'))
+    for row in table:
+        print('{name:<24}{matches:>8}{wins:>6}{losses:>8}{ties:>6}{bankroll:>12}{adjusted:>12.1f}'.format(**row))
+
+
+def parse_args():
+    '''
+    Parses the tournament's command line arguments.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 tournament.py')
+    parser.add_argument('paths', nargs='+',
+                        help='Pokerbot directories, each containing a commands.json, or Python scripts inside them')
+    parser.add_argument('--mode', choices=['round-robin', 'gauntlet'], default='round-robin',
+                        help='Play every pairing, or only the first bot against each other bot')
+    parser.add_argument('--matches', type=int, default=1, help='Matches per pairing, alternating seats')
+    parser.add_argument('--workers', type=int, default=None, help='Concurrent matches, defaults to the number of cores')
+    parser.add_argument('--output-dir', type=str, default='tournament', help='Directory for per-match output')
+    parser.add_argument('--in-process', action='store_true', help='Run Python bots inside the match processes')
+    parser.add_argument('--duplicate', action='store_true', help='Play every deal twice with the seats swapped')
+    parser.add_argument('--warm', action='store_true', help='Keep pokerbots running between the matches of a worker')
+    parser.add_argument('--early-stop', action='store_true',
+                        help='End each match once a sequential test decides it, instead of playing every round')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep the results of finished matches in output-dir and continue interrupted ones')
+    add_config_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print_standings(run_tournament(args.paths, args.mode, args.matches, args.workers,
+                                   args.output_dir, args.in_process, args.duplicate, args.warm,
+                                   args.early_stop, config_from_args(args), args.resume))